@@ -1,24 +1,81 @@
 """just for pylint"""
+import time
+STARTUP_T0 = time.perf_counter()  # Taken before the other imports so startup profiling covers them
 import os
+import sys
+import json
+import gzip
+import hashlib
+import asyncio
+import threading
+import sqlite3
+import socket
+import heapq
+import itertools
+import traceback
+import signal
+import contextvars
+import functools
+import io
+import cProfile
+import pstats
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+from bisect import bisect_left
 from dotenv import load_dotenv
 from bs4 import BeautifulSoup
 import discord
 import regex
+import numpy as np
 from discord.ext import commands, tasks
 from discord import app_commands
+from aiohttp import web
 import requests
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # Use non-GUI backend to prevent threading warnings
-import mplfinance as mpf
+from typing import Optional, Dict, Any, List, Tuple
+try:
+    import fcntl  # POSIX only; file locks fall back to in-process locking elsewhere
+except ImportError:
+    fcntl = None
+# pandas, matplotlib and mplfinance are only needed for charts - see load_chart_libs()
+
+# Seconds spent in each startup phase; printed once ready when NTB_PROFILE_STARTUP is set
+startup_timings: Dict[str, float] = {'imports': time.perf_counter() - STARTUP_T0}
 
 load_dotenv()
+STARTUP_PROFILE = os.getenv("NTB_PROFILE_STARTUP", "").lower() in ("1", "true", "yes")
 MY_BOT_TOKEN = str(os.getenv("DISCORD_BOT_TOK"))
 intents = discord.Intents.default()
 intents.message_content = True
-client = commands.Bot(command_prefix="!", intents=intents)
+
+
+class TracedContext(commands.Context):
+    """Context that times Discord sends as spans of the command's trace"""
+    async def send(self, *args, **kwargs):
+        with trace_span('discord send'):
+            return await super().send(*args, **kwargs)
+
+    async def defer(self, *args, **kwargs):
+        with trace_span('discord defer'):
+            return await super().defer(*args, **kwargs)
+
+
+# discord.py picks the shard count; all shards in this process share its caches and pollers
+SHARDED = os.getenv("NTB_SHARDED", "").lower() in ("1", "true", "yes")
+
+
+class NepseBot(commands.AutoShardedBot if SHARDED else commands.Bot):
+    async def get_context(self, origin, /, *, cls=TracedContext):
+        return await super().get_context(origin, cls=cls)
+
+
+client = NepseBot(command_prefix="!", intents=intents)
+
+# Directory for on-disk state (company metadata, logos, HTTP cache, ...)
+DATA_DIR = os.getenv("NTB_DATA_DIR", "data")
 
 # dict style: user_alerts = {'user_id': {'stock_name': [target_price1, target_price2]}}
 user_alerts = {}
@@ -29,6 +86,8 @@ user_alerts = {}
 
 def format_number(num):
     """Format large numbers with K, M, B suffixes"""
+    if num is None:
+        return "N/A"
     try:
         num = float(str(num).replace(',', ''))
         if num >= 1_000_000_000:
@@ -59,6 +118,695 @@ def get_relative_time(timestamp_str):
         return timestamp_str
 
 
+# ============================================
+# Metrics (Prometheus text format, served by a small aiohttp app)
+# ============================================
+
+METRICS_PORT = int(os.getenv("NTB_METRICS_PORT", "9108"))  # 0 disables the endpoint
+METRICS_HOST = os.getenv("NTB_METRICS_HOST", "127.0.0.1")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = '') -> str:
+    parts = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: Dict[Tuple[Any, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0) -> None:
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple[Any, ...], List[float]] = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0.0] * (len(self.buckets) + 2)
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self.series.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter whose values are read from existing stats when scraped"""
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], collect, kind: str = 'gauge'):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.collect = collect  # () -> {label values tuple: value}
+        self.kind = kind
+
+    def samples(self) -> List[str]:
+        try:
+            items = list(self.collect().items())
+        except Exception as e:
+            print(f"Metric {self.name} collection failed: {e}")
+            return []
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in items if value is not None]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+command_latency = metrics.register(Histogram(
+    'ntb_command_duration_seconds', 'Command latency including admission queueing', ('command', 'outcome')))
+command_errors = metrics.register(Counter(
+    'ntb_command_errors_total', 'Commands that ended in an error, by error type', ('command', 'error')))
+upstream_latency = metrics.register(Histogram(
+    'ntb_upstream_request_duration_seconds', 'Upstream HTTP request latency', ('host', 'outcome')))
+cache_requests = metrics.register(Counter(
+    'ntb_cache_requests_total', 'Market data cache lookups', ('category', 'result')))
+loop_lag = metrics.register(Histogram(
+    'ntb_event_loop_lag_seconds', 'Delay of the event loop waking a sleeping task', (),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)))
+alert_loop_duration = metrics.register(Histogram(
+    'ntb_alert_loop_duration_seconds', 'Duration of one check_stock_alerts scan', ()))
+
+
+
+def _executor_stat(key: str) -> Dict[Tuple[str], int]:
+    values = {(name,): executor.get_stats()[key] for name, executor in bounded_executors.items()}
+    if key == 'queued':
+        # Background pollers use the loop's default executor
+        default_executor = getattr(asyncio.get_running_loop(), '_default_executor', None)
+        if default_executor is not None:
+            values[('default',)] = default_executor._work_queue.qsize()
+    return values
+
+
+# Read from the stats the bot already keeps (objects defined further down are looked up at scrape time)
+metrics.register(CallbackMetric(
+    'ntb_executor_queue_depth', 'Work items waiting for an executor thread', ('executor',),
+    lambda: _executor_stat('queued')))
+metrics.register(CallbackMetric(
+    'ntb_executor_active', 'Executor threads busy', ('executor',), lambda: _executor_stat('active')))
+metrics.register(CallbackMetric(
+    'ntb_executor_rejected_total', 'Submissions shed because the executor was full', ('executor',),
+    lambda: _executor_stat('rejected'), kind='counter'))
+metrics.register(CallbackMetric(
+    'ntb_http_cache_total', 'Disk HTTP cache outcomes', ('result',),
+    lambda: {(k,): v for k, v in http_cache.stats.items()}, kind='counter'))
+metrics.register(CallbackMetric(
+    'ntb_embed_cache_total', 'Rendered embed cache lookups', ('result',),
+    lambda: {('hit',): embed_cache.hits, ('miss',): embed_cache.misses}, kind='counter'))
+metrics.register(CallbackMetric(
+    'ntb_admission_queue_depth', 'Commands waiting for admission', (),
+    lambda: {(): admission.get_stats()['queue_depth']}))
+metrics.register(CallbackMetric(
+    'ntb_alert_queue_depth', 'Users waiting for an alert DM', (),
+    lambda: {(): alert_dispatcher.get_stats()['queue_depth']}))
+metrics.register(CallbackMetric(
+    'ntb_is_leader', 'Whether this process runs the background pollers', (),
+    lambda: {(): int(leader_lease.is_leader)}))
+
+LOOP_LAG_INTERVAL = 0.5  # Seconds between event-loop lag probes
+
+# The loop only keeps weak references to tasks, so fire-and-forget tasks are held here until they finish
+background_tasks = set()
+
+
+def create_background_task(coro) -> asyncio.Task:
+    """Start a task that nobody awaits without letting it be garbage-collected mid-run"""
+    task = asyncio.ensure_future(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+async def monitor_loop_lag():
+    """Measure how late the loop wakes a task that asked to sleep for a fixed interval"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        loop_lag.observe(max(0.0, time.perf_counter() - started - LOOP_LAG_INTERVAL))
+
+
+async def handle_metrics(request):
+    return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+
+async def start_metrics_server():
+    """Serve /metrics and start the loop-lag probe and watchdog; runs before the gateway connects"""
+    create_background_task(monitor_loop_lag())
+    create_background_task(loop_watchdog.run())
+    if not METRICS_PORT:
+        return
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    except OSError as e:
+        print(f"Metrics server failed to start on port {METRICS_PORT}: {e}")
+        return
+    print(f"Metrics available on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+
+# ============================================
+# Tracing (nested span timings per command, kept in a ring buffer)
+# ============================================
+
+TRACE_BUFFER_SIZE = 200      # Completed command traces kept for /perfstats
+TRACE_LATENCY_WINDOW = 500   # Recent durations per command used for percentiles
+PROFILE_REPORT_LINES = 30
+
+current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed step; children are the steps it waited on"""
+    __slots__ = ('name', 'started', 'duration', 'children')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.children: List['Span'] = []
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.started
+
+
+@contextmanager
+def trace_span(name: str):
+    """Time a step as a child of the current span; does nothing outside a traced command"""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    span = Span(name)
+    parent.children.append(span)
+    token = current_span.set(span)
+    try:
+        yield span
+    finally:
+        span.finish()
+        current_span.reset(token)
+
+
+async def run_blocking(func, *args, executor=None):
+    """run_in_executor that carries the current trace into the worker thread"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(context.run, func, *args))
+
+
+async def gather_blocking(*calls, executor=None):
+    """
+    Run independent blocking fetches concurrently, e.g.
+    rows, as_of = await gather_blocking((get_nepse_indices,), (get_ss_time,))
+    so a command waits for its slowest fetch rather than the sum of them.
+    """
+    return await asyncio.gather(*(run_blocking(func, *args, executor=executor) for func, *args in calls))
+
+
+class TraceRecorder:
+    """Root spans for commands, per-command latency windows and one-shot cProfile runs"""
+    def __init__(self):
+        self.traces = deque(maxlen=TRACE_BUFFER_SIZE)
+        self.latencies: Dict[str, deque] = {}
+        self.profile_target: Optional[str] = None
+        self.active_profile = None           # (ctx, cProfile.Profile)
+        self.last_profile: Optional[Tuple[str, str]] = None  # (command, pstats report)
+
+    def start(self, ctx) -> None:
+        """Open the root span for a command (called before admission so queueing is included)"""
+        name = ctx.command.qualified_name
+        root = Span(name)
+        ctx.trace_root = root
+        ctx.trace_token = current_span.set(root)
+        # Lets the loop watchdog attribute a stall to the command that caused it
+        task = asyncio.current_task()
+        if task is not None:
+            task.set_name(f"command:{name}")
+        if self.profile_target == name and self.active_profile is None:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # Another profiler is already active in this interpreter
+                print(f"Could not profile {name}: {e}")
+                return
+            self.profile_target = None
+            self.active_profile = (ctx, profiler)
+
+    def finish(self, ctx) -> None:
+        """Close the root span and record the trace; safe to call more than once"""
+        root = getattr(ctx, 'trace_root', None)
+        if root is None:
+            return
+        ctx.trace_root = None
+        root.finish()
+        try:
+            current_span.reset(ctx.trace_token)
+        except ValueError:
+            # Error handlers run in their own task/context
+            pass
+        self.traces.append((datetime.now(), root))
+        self.latencies.setdefault(root.name, deque(maxlen=TRACE_LATENCY_WINDOW)).append(root.duration)
+
+        if self.active_profile is not None and self.active_profile[0] is ctx:
+            profiler = self.active_profile[1]
+            self.active_profile = None
+            profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_REPORT_LINES)
+            self.last_profile = (root.name, stream.getvalue())
+
+    def percentiles(self) -> Dict[str, Tuple[int, float, float, float]]:
+        """command -> (samples, p50, p95, p99) in seconds"""
+        result = {}
+        for name, window in self.latencies.items():
+            values = sorted(window)
+            if not values:
+                continue
+
+            def pick(p: float) -> float:
+                return values[min(len(values) - 1, int(p * len(values)))]
+
+            result[name] = (len(values), pick(0.50), pick(0.95), pick(0.99))
+        return result
+
+    def slowest(self, limit: int = 3) -> List[Tuple[datetime, Span]]:
+        return heapq.nlargest(limit, list(self.traces), key=lambda item: item[1].duration)
+
+    @staticmethod
+    def format_span(span: Span, depth: int = 0, lines: Optional[List[str]] = None) -> List[str]:
+        """Indented tree of span timings"""
+        if lines is None:
+            lines = []
+        duration = f"{span.duration * 1000:.0f}ms" if span.duration is not None else "running"
+        lines.append(f"{'  ' * depth}{span.name} {duration}")
+        for child in span.children:
+            TraceRecorder.format_span(child, depth + 1, lines)
+        return lines
+
+
+tracer = TraceRecorder()
+
+
+# ============================================
+# Request Deadlines (time budget carried through the fetch chain)
+# ============================================
+
+STONK_DEADLINE = float(os.getenv("NTB_STONK_DEADLINE", "4.0"))  # Seconds /stonk waits before rendering what it has
+
+current_deadline: contextvars.ContextVar = contextvars.ContextVar('current_deadline', default=None)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """The request's time budget ran out before an upstream call could start"""
+
+
+class Deadline:
+    """Absolute time budget for one request"""
+    __slots__ = ('expires_at',)
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+@contextmanager
+def request_deadline(seconds: float):
+    """Run the block (and any task or run_blocking call started in it) under a deadline"""
+    deadline = Deadline(seconds)
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+def deadline_timeout(timeout: Optional[float]) -> Optional[float]:
+    """Cap a timeout by the current deadline; raise DeadlineExceeded if it has already passed"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return timeout
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+# ============================================
+# Executors (one bounded pool per workload class)
+# ============================================
+
+class ExecutorSaturated(RuntimeError):
+    """Raised instead of queueing when a workload's executor is full"""
+    def __init__(self, name: str):
+        super().__init__(f"{name} executor is saturated")
+        self.name = name
+
+
+bounded_executors: Dict[str, 'BoundedExecutor'] = {}
+
+
+class BoundedExecutor(ThreadPoolExecutor):
+    """
+    Thread pool with its own worker and queue limits. Once max_workers + max_queue
+    items are in flight, submit() raises ExecutorSaturated so callers can shed the
+    request instead of queueing it without bound (max_queue=None never sheds).
+    """
+    def __init__(self, name: str, max_workers: int, max_queue: Optional[int]):
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.stats = {'submitted': 0, 'completed': 0, 'rejected': 0}
+        self._count_lock = threading.Lock()
+        bounded_executors[name] = self
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._count_lock:
+            if self.max_queue is not None and self.in_flight >= self.max_workers + self.max_queue:
+                self.stats['rejected'] += 1
+                raise ExecutorSaturated(self.name)
+            self.in_flight += 1
+            self.stats['submitted'] += 1
+        try:
+            future = super().submit(fn, *args, **kwargs)
+        except Exception:
+            with self._count_lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future) -> None:
+        with self._count_lock:
+            self.in_flight -= 1
+            self.stats['completed'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        in_flight = self.in_flight
+        return {
+            **self.stats,
+            'active': min(in_flight, self.max_workers),
+            'queued': max(0, in_flight - self.max_workers),
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+        }
+
+
+# Upstream scrapes for commands (mostly waiting on the network)
+io_executor = BoundedExecutor('io', max_workers=16, max_queue=32)
+# Pure-Python parsing / index building (GIL-bound, so few threads)
+cpu_executor = BoundedExecutor('cpu', max_workers=2, max_queue=16)
+# Chart rendering (matplotlib is slow and memory hungry)
+render_executor = BoundedExecutor('render', max_workers=2, max_queue=4)
+
+
+# ============================================
+# Event-Loop Watchdog (finds code that blocks the loop)
+# ============================================
+
+LOOP_BLOCK_THRESHOLD = float(os.getenv("NTB_LOOP_BLOCK_THRESHOLD", "0.25"))  # Seconds
+LOOP_HEARTBEAT_INTERVAL = 0.05
+LOOP_BLOCK_STACK_DEPTH = 8
+
+loop_blocks = metrics.register(Histogram(
+    'ntb_loop_block_duration_seconds', 'Event-loop stalls longer than the watchdog threshold',
+    ('source', 'location'), buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)))
+
+
+class LoopWatchdog:
+    """
+    A coroutine bumps a heartbeat every few milliseconds; a daemon thread watches it.
+    When the heartbeat stops for longer than the threshold, the thread captures the loop
+    thread's stack and the running task (commands name their task, see TraceRecorder.start),
+    then logs and records the stall once the loop is responsive again.
+    """
+    def __init__(self, threshold: float = LOOP_BLOCK_THRESHOLD):
+        self.threshold = threshold
+        self.loop = None
+        self.loop_thread_id = None
+        self.heartbeat = time.monotonic()
+        self.blocks = deque(maxlen=50)  # Recent stalls for /perfstats
+        self._current: Optional[Dict[str, Any]] = None
+
+    async def run(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        threading.Thread(target=self._watch, name='loop-watchdog', daemon=True).start()
+        while True:
+            self.heartbeat = time.monotonic()
+            await asyncio.sleep(LOOP_HEARTBEAT_INTERVAL)
+
+    def _capture(self, heartbeat: float) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        # The innermost frame in our own code is the useful attribution (e.g. get_ss_time)
+        location = 'unknown'
+        for frame_summary in reversed(stack):
+            if frame_summary.filename == __file__:
+                location = f"{frame_summary.name}:{frame_summary.lineno}"
+                break
+        return {
+            'heartbeat': heartbeat,
+            'source': task.get_name() if task is not None else 'callback',
+            'location': location,
+            'stack': stack[-LOOP_BLOCK_STACK_DEPTH:],
+        }
+
+    def _watch(self) -> None:
+        while True:
+            time.sleep(LOOP_HEARTBEAT_INTERVAL)
+            heartbeat = self.heartbeat
+            if self._current is None:
+                if time.monotonic() - heartbeat - LOOP_HEARTBEAT_INTERVAL > self.threshold:
+                    self._current = self._capture(heartbeat)
+            elif heartbeat != self._current['heartbeat']:
+                self._finish(heartbeat)
+
+    def _finish(self, heartbeat: float) -> None:
+        block = self._current
+        self._current = None
+        block['duration'] = max(0.0, heartbeat - block['heartbeat'] - LOOP_HEARTBEAT_INTERVAL)
+        block['when'] = datetime.now()
+        self.blocks.append(block)
+        loop_blocks.observe(block['duration'], block['source'], block['location'])
+        print(
+            f"Event loop blocked for {block['duration']:.2f}s by {block['source']} in {block['location']}\n"
+            + ''.join(traceback.format_list(block['stack']))
+        )
+
+
+loop_watchdog = LoopWatchdog()
+
+
+# ============================================
+# Market Data Records (parsed once, formatted only when rendering)
+# ============================================
+
+def _to_float(value):
+    """Parse a number that may be a formatted string like '1,234.50' or '2.5%'"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', '').replace('%', '').strip())
+    except ValueError:
+        return None
+
+
+def _format_price(value):
+    return f"{value:,.2f}" if isinstance(value, (int, float)) else "N/A"
+
+
+def _format_pct(value):
+    return f"{value:.2f}%" if isinstance(value, (int, float)) else "N/A"
+
+
+def _format_count(value):
+    return f"{int(value):,}" if isinstance(value, (int, float)) else "N/A"
+
+
+@dataclass(slots=True)
+class Quote:
+    """Live quote for one symbol"""
+    symbol: str
+    ltp: Optional[float]
+    pt_change: Optional[float]
+    pct_change: Optional[float]
+    open: Optional[float]
+    high: Optional[float]
+    low: Optional[float]
+    volume: Optional[float]
+    prev_close: Optional[float]
+    as_of: str
+
+    @classmethod
+    def from_live_row(cls, row: List[str], as_of: str) -> 'Quote':
+        """From a ShareSansar live-trading row: S.No, Symbol, LTP, Pt, %, Open, High, Low, Volume, Prev. Close"""
+        return cls(row[1], *(_to_float(cell) for cell in row[2:10]), as_of)
+
+    @classmethod
+    def from_sharehub(cls, item: Dict[str, Any], as_of: str) -> 'Quote':
+        """From one ShareHub liveCompanyData entry (field names vary between API versions)"""
+        ltp = _to_float(item.get('lastTradedPrice', item.get('ltp')))
+        prev_close = _to_float(item.get('previousClose', item.get('previousClosePrice')))
+        pt_change = _to_float(item.get('change'))
+        if pt_change is None and ltp is not None and prev_close is not None:
+            pt_change = ltp - prev_close
+        return cls(
+            symbol=str(item['symbol']).upper(),
+            ltp=ltp,
+            pt_change=pt_change,
+            pct_change=_to_float(item.get('changePercent', item.get('percentageChange'))),
+            open=_to_float(item.get('openPrice', item.get('open'))),
+            high=_to_float(item.get('highPrice', item.get('high'))),
+            low=_to_float(item.get('lowPrice', item.get('low'))),
+            volume=_to_float(item.get('totalTradeQuantity', item.get('volume'))),
+            prev_close=prev_close,
+            as_of=item.get('lastUpdatedDateTime', as_of),
+        )
+
+
+@dataclass(slots=True)
+class IndexRow:
+    """One main index or sub-index row"""
+    name: str
+    open: Optional[float]
+    high: Optional[float]
+    low: Optional[float]
+    close: Optional[float]
+    pt_change: Optional[float]
+    pct_change: Optional[float]
+    turnover: Optional[float]
+
+    @classmethod
+    def from_cells(cls, cells: List[str]) -> 'IndexRow':
+        """From a ShareSansar index row: name, open, high, low, close, pt change, % change, turnover"""
+        return cls(cells[0].strip(), *(_to_float(cell) for cell in cells[1:8]))
+
+
+@dataclass(slots=True)
+class MarketSummary:
+    """Whole-market totals from the ShareSansar market summary table"""
+    as_of: str
+    turnover: Optional[float]
+    traded_shares: Optional[float]
+    transactions: Optional[float]
+    scrips_traded: Optional[float]
+    market_cap: Optional[float]
+    floated_market_cap: Optional[float]
+
+
+@dataclass(slots=True)
+class TopMover:
+    """One row of a top gainers/losers table"""
+    symbol: str
+    ltp: Optional[float]
+    pct_change: Optional[float]
+    high: Optional[float]
+    low: Optional[float]
+    open: Optional[float]
+    volume: Optional[float]
+    turnover: Optional[float]
+    trades: Optional[float] = None
+
+
+# Records stored in the market cache; shared backends and snapshots serialize them by name
+CACHE_RECORD_TYPES = {record.__name__: record for record in (Quote, IndexRow, MarketSummary, TopMover)}
+
+
+def encode_cache_record(obj):
+    """json.dumps default= hook for cached records"""
+    if type(obj).__name__ in CACHE_RECORD_TYPES:
+        return {'__record__': type(obj).__name__, 'values': [getattr(obj, f.name) for f in fields(obj)]}
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def decode_cache_record(obj: Dict[str, Any]):
+    """json.loads object_hook= counterpart of encode_cache_record"""
+    record = CACHE_RECORD_TYPES.get(obj.get('__record__'))
+    if record is None:
+        return obj
+    return record(*obj['values'])
+
+
+CACHE_SNAPSHOT_FORMAT = 2  # Bump when the shape of cached data changes
+
+
 class MarketDataCache:
     """In-memory cache for market data with TTL (Time To Live)"""
     def __init__(self):
@@ -70,54 +818,956 @@ class MarketDataCache:
             'nepse_indices': 60,      # 1 minute - NEPSE indices
             'sub_indices': 120,       # 2 minutes - sub-indices change less frequently
             'top_gainers_losers': 60, # 1 minute - top G/L rankings
-            'company_logo': 3600,     # 1 hour - logos rarely change
+            'public_offerings': 300,  # 5 minutes - IPO listings
             'stock_symbols': 3600     # 1 hour - stock symbols list changes rarely
         }
+        # Negative entries (an upstream answered "not found"; failed fetches are never cached) use their own, shorter TTLs
+        self.negative_duration = {
+            'stock_details': 120,     # 2 minutes - a quote source answered that the symbol isn't listed
+            'sub_indices': 300,       # 5 minutes - unknown sub-index name
+            'company_logo': 21600,    # 6 hours - company page has no logo
+        }
+        # Seconds an expired entry is kept around to serve stale when upstreams are down
+        self.stale_grace = 3600
+        # Every set() gets a new version so derived data (e.g. rendered embeds) can be invalidated
+        self._versions = itertools.count(1)
+    
+    # Storage primitives - shared backends override these and inherit the TTL logic below
+    def _load(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        return self.cache.get(cache_key)
+    
+    def _store(self, cache_key: str, entry: Dict[str, Any]) -> None:
+        self.cache[cache_key] = entry
+    
+    def _delete(self, cache_key: str) -> None:
+        self.cache.pop(cache_key, None)
+    
+    def _entries(self) -> List[Tuple[str, Dict[str, Any]]]:
+        return list(self.cache.items())
+    
+    def _next_version(self) -> int:
+        return next(self._versions)
     
     def get(self, key: str, category: str) -> Optional[Any]:
-        """Retrieve cached data if still valid"""
+        """Retrieve cached data if still valid (negative entries return None)"""
         cache_key = f"{category}:{key}"
-        if cache_key in self.cache:
-            data = self.cache[cache_key]['data']
-            timestamp = self.cache[cache_key]['timestamp']
+        entry = self._load(cache_key)
+        if entry is not None:
+            age = datetime.now() - entry['timestamp']
+            if entry.get('negative'):
+                if age >= timedelta(seconds=self.negative_duration.get(category, 60)):
+                    self._delete(cache_key)
+                cache_requests.inc(category, 'negative')
+                return None
             duration = self.cache_duration.get(category, 60)
             
             # Check if cache is still valid
-            if datetime.now() - timestamp < timedelta(seconds=duration):
-                return data
-            # Cache expired, remove it
-            del self.cache[cache_key]
+            if age < timedelta(seconds=duration):
+                cache_requests.inc(category, 'hit')
+                return entry['data']
+            # Expired entries are kept for a grace period so they can be served stale
+            if age >= timedelta(seconds=duration + self.stale_grace):
+                self._delete(cache_key)
+        cache_requests.inc(category, 'miss')
         return None
     
+    def get_stale(self, key: str, category: str) -> Optional[Any]:
+        """Retrieve cached data even if expired (used when an upstream is unavailable)"""
+        entry = self._load(f"{category}:{key}")
+        return entry['data'] if entry else None
+    
     def set(self, key: str, category: str, data: Any) -> None:
         """Store data in cache with timestamp"""
         cache_key = f"{category}:{key}"
-        self.cache[cache_key] = {
+        self._store(cache_key, {
             'data': data,
-            'timestamp': datetime.now()
-        }
+            'timestamp': datetime.now(),
+            'version': self._next_version()
+        })
+    
+    def set_negative(self, key: str, category: str) -> None:
+        """Remember that a lookup found nothing (or failed), keeping any stale data for fallback"""
+        cache_key = f"{category}:{key}"
+        previous = self._load(cache_key)
+        self._store(cache_key, {
+            'data': previous['data'] if previous else None,
+            'timestamp': datetime.now(),
+            'negative': True
+        })
+    
+    def is_negative(self, key: str, category: str) -> bool:
+        """Check for an unexpired negative entry"""
+        entry = self._load(f"{category}:{key}")
+        if entry is None or not entry.get('negative'):
+            return False
+        age = datetime.now() - entry['timestamp']
+        return age < timedelta(seconds=self.negative_duration.get(category, 60))
+    
+    def get_version(self, key: str, category: str) -> Optional[int]:
+        """Version of the data currently stored for a key (changes whenever it is refreshed)"""
+        entry = self._load(f"{category}:{key}")
+        return entry.get('version') if entry else None
     
     def clear(self, category: Optional[str] = None) -> None:
         """Clear cache for a specific category or all"""
         if category:
-            keys_to_delete = [k for k in self.cache.keys() if k.startswith(f"{category}:")]
+            keys_to_delete = [k for k, _ in self._entries() if k.startswith(f"{category}:")]
             for key in keys_to_delete:
-                del self.cache[key]
+                self._delete(key)
         else:
             self.cache.clear()
     
     def get_stats(self) -> Dict[str, int]:
         """Get cache statistics"""
         stats = {}
-        for category in self.cache_duration.keys():
-            count = len([k for k in self.cache.keys() if k.startswith(f"{category}:")])
+        entries = self._entries()
+        categories = list(self.cache_duration) + [c for c in self.negative_duration if c not in self.cache_duration]
+        for category in categories:
+            count = len([k for k, entry in entries if k.startswith(f"{category}:") and not entry.get('negative')])
             stats[category] = count
-        stats['total'] = len(self.cache)
+        stats['negative'] = len([k for k, entry in entries if entry.get('negative')])
+        stats['total'] = len(entries)
         return stats
+    
+    def save_snapshot(self, path: str) -> int:
+        """Write every entry to a gzip JSON file (atomically); returns the number saved"""
+        snapshot = [
+            [cache_key, entry['data'], entry['timestamp'].timestamp(), bool(entry.get('negative'))]
+            for cache_key, entry in self._entries()
+        ]
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump({'format': CACHE_SNAPSHOT_FORMAT, 'entries': snapshot}, f,
+                          separators=(',', ':'), default=encode_cache_record)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error saving cache snapshot {path}: {e}")
+            return 0
+        return len(snapshot)
+    
+    def load_snapshot(self, path: str) -> int:
+        """Restore entries that get() would still serve (fresh or within the stale grace); returns the count"""
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                snapshot = json.load(f, object_hook=decode_cache_record)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error loading cache snapshot {path}: {e}")
+            return 0
+        if not isinstance(snapshot, dict) or snapshot.get('format') != CACHE_SNAPSHOT_FORMAT:
+            # Written by a version that cached different shapes; start cold instead
+            return 0
+        snapshot = snapshot['entries']
+        
+        restored = 0
+        now = datetime.now()
+        for cache_key, data, timestamp, negative in snapshot:
+            category = cache_key.split(':', 1)[0]
+            stored_at = datetime.fromtimestamp(timestamp)
+            if negative:
+                keep_for = self.negative_duration.get(category, 60)
+            else:
+                keep_for = self.cache_duration.get(category, 60) + self.stale_grace
+            if now - stored_at >= timedelta(seconds=keep_for):
+                continue
+            entry = {'data': data, 'timestamp': stored_at}
+            if negative:
+                entry['negative'] = True
+            else:
+                entry['version'] = self._next_version()
+            self._store(cache_key, entry)
+            restored += 1
+        return restored
 
 
-# Initialize cache
-market_cache = MarketDataCache()
+class SQLiteMarketCache(MarketDataCache):
+    """
+    MarketDataCache kept in a SQLite file so every bot process on a host shares one cache
+    (and therefore one set of upstream scrapes). Same API and TTLs as the in-memory cache;
+    data is stored as JSON.
+    """
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS market_cache_v2 ("
+            "key TEXT PRIMARY KEY, data TEXT, timestamp REAL NOT NULL, "
+            "version INTEGER, negative INTEGER NOT NULL DEFAULT 0)"
+        )
+    
+    def _conn(self) -> sqlite3.Connection:
+        """One autocommit connection per thread (fetches run on executor threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def _row_to_entry(row) -> Dict[str, Any]:
+        data, timestamp, version, negative = row
+        entry = {'data': json.loads(data, object_hook=decode_cache_record), 'timestamp': datetime.fromtimestamp(timestamp)}
+        if negative:
+            entry['negative'] = True
+        else:
+            entry['version'] = version
+        return entry
+    
+    def _load(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        try:
+            row = self._conn().execute(
+                "SELECT data, timestamp, version, negative FROM market_cache_v2 WHERE key = ?", (cache_key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Shared cache read failed for {cache_key}: {e}")
+            return None
+        return self._row_to_entry(row) if row else None
+    
+    def _store(self, cache_key: str, entry: Dict[str, Any]) -> None:
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO market_cache_v2 (key, data, timestamp, version, negative) VALUES (?, ?, ?, ?, ?)",
+                (cache_key, json.dumps(entry['data'], separators=(',', ':'), default=encode_cache_record), entry['timestamp'].timestamp(),
+                 entry.get('version'), 1 if entry.get('negative') else 0)
+            )
+        except sqlite3.Error as e:
+            print(f"Shared cache write failed for {cache_key}: {e}")
+    
+    def _delete(self, cache_key: str) -> None:
+        try:
+            self._conn().execute("DELETE FROM market_cache_v2 WHERE key = ?", (cache_key,))
+        except sqlite3.Error as e:
+            print(f"Shared cache delete failed for {cache_key}: {e}")
+    
+    def _entries(self) -> List[Tuple[str, Dict[str, Any]]]:
+        try:
+            rows = self._conn().execute(
+                "SELECT key, data, timestamp, version, negative FROM market_cache_v2"
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Shared cache scan failed: {e}")
+            return []
+        return [(row[0], self._row_to_entry(row[1:])) for row in rows]
+    
+    def _next_version(self) -> int:
+        # Must be unique across processes, not just within this one
+        return time.time_ns()
+    
+    def clear(self, category: Optional[str] = None) -> None:
+        """Clear cache for a specific category or all"""
+        try:
+            if category:
+                prefix = f"{category}:"
+                self._conn().execute("DELETE FROM market_cache_v2 WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+            else:
+                self._conn().execute("DELETE FROM market_cache_v2")
+        except sqlite3.Error as e:
+            print(f"Shared cache clear failed: {e}")
+    
+    def save_snapshot(self, path: str) -> int:
+        """Nothing to do - the shared cache already lives on disk"""
+        return 0
+    
+    def load_snapshot(self, path: str) -> int:
+        return 0
+
+
+# Initialize cache ("sqlite" shares it between bot processes on the same host)
+CACHE_BACKEND = os.getenv("NTB_CACHE_BACKEND", "memory").lower()
+SHARED_DB_PATH = os.getenv("NTB_SHARED_DB", os.path.join(DATA_DIR, 'shared.sqlite3'))
+if CACHE_BACKEND == 'sqlite':
+    market_cache = SQLiteMarketCache(SHARED_DB_PATH)
+else:
+    market_cache = MarketDataCache()
+
+# Snapshot written on shutdown and restored here, so a restart doesn't start cold
+CACHE_SNAPSHOT_PATH = os.path.join(DATA_DIR, 'market_cache.json.gz')
+_restore_started = time.perf_counter()
+_restored_entries = market_cache.load_snapshot(CACHE_SNAPSHOT_PATH)
+startup_timings['cache_restore'] = time.perf_counter() - _restore_started
+if _restored_entries:
+    print(f"Market cache: restored {_restored_entries} entries from snapshot")
+
+
+# ============================================
+# Leader Election (one process runs the background pollers)
+# ============================================
+
+LEADER_LEASE_TTL = 30  # Seconds a lease is valid without renewal
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaderLease:
+    """
+    Time-limited lease row in the shared SQLite database. The holder renews it every
+    few seconds; if it dies, another process takes over once the lease expires.
+    Without a shared database (single process) this process is always the leader.
+    """
+    def __init__(self, name: str, path: Optional[str], ttl: int = LEADER_LEASE_TTL):
+        self.name = name
+        self.path = path
+        self.ttl = ttl
+        self.is_leader = path is None
+        self.expires_at = 0.0
+        self.transitions = 0
+
+    def renew(self) -> bool:
+        """Take or extend the lease if it is free, expired or already ours"""
+        if self.path is None:
+            return True
+        now = time.time()
+        conn = None
+        try:
+            conn = sqlite3.connect(self.path, timeout=5)
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS leases ("
+                    "name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                    "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                    (self.name, INSTANCE_ID, now + self.ttl, now)
+                )
+                row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+            leader = row is not None and row[0] == INSTANCE_ID
+            if leader:
+                self.expires_at = row[1]
+        except sqlite3.Error as e:
+            # Keep leading only while our last lease is still valid
+            print(f"Leader lease renewal failed: {e}")
+            leader = self.is_leader and time.time() < self.expires_at
+        finally:
+            if conn is not None:
+                conn.close()
+
+        if leader != self.is_leader:
+            self.transitions += 1
+            print(f"Leader lease '{self.name}': {INSTANCE_ID} is now {'leader' if leader else 'follower'}")
+        self.is_leader = leader
+        return leader
+
+
+leader_lease = LeaderLease('pollers', SHARED_DB_PATH if CACHE_BACKEND == 'sqlite' else None)
+
+
+@tasks.loop(seconds=LEADER_LEASE_TTL / 3)
+async def renew_leader_lease():
+    await client.loop.run_in_executor(None, leader_lease.renew)
+
+
+class EmbedCache:
+    """Pre-rendered embed payloads keyed by name and the version of the data they were built from"""
+    def __init__(self):
+        self.entries: Dict[str, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _detach(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Shallow copy that gives the field list its own containers. Embed.from_dict and to_dict
+        share nested values, and add_field/set_field_at mutate the list in place; every other
+        setter replaces its dict, so nothing else needs copying.
+        """
+        if 'fields' not in payload:
+            return dict(payload)
+        return {**payload, 'fields': [dict(field) for field in payload['fields']]}
+
+    def get_or_build(self, name: str, version: Any, builder) -> discord.Embed:
+        """Return a copy of the cached embed if its data version matches, otherwise build and store it"""
+        entry = self.entries.get(name)
+        if version is not None and entry is not None and entry[0] == version:
+            self.hits += 1
+            return discord.Embed.from_dict(self._detach(entry[1]))
+        self.misses += 1
+        with trace_span(f"render {name}"):
+            embed = builder()
+        if version is not None:
+            self.entries[name] = (version, self._detach(embed.to_dict()))
+        return embed
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+embed_cache = EmbedCache()
+
+
+# ============================================
+# Upstream Guards (per-host rate limit + circuit breaker)
+# ============================================
+
+class UpstreamUnavailable(requests.exceptions.RequestException):
+    """Raised when a host's circuit breaker is open or its rate limit is exhausted"""
+
+
+# Requests per second and burst size allowed per upstream host
+UPSTREAM_RATE_LIMITS = {
+    'www.sharesansar.com': (2.0, 5),
+    'merolagani.com': (1.0, 3),
+    'nepsealpha.com': (2.0, 5),
+    'sharehubnepal.com': (4.0, 8),
+}
+UPSTREAM_DEFAULT_RATE_LIMIT = (2.0, 5)
+UPSTREAM_MAX_WAIT = 2.0             # Max seconds to wait for a token before failing fast
+BREAKER_FAILURE_THRESHOLD = 5       # Consecutive failures that open the breaker
+BREAKER_RESET_TIMEOUT = 30          # Seconds before an open breaker lets a trial request through
+BACKGROUND_TOKEN_RESERVE = 0.5      # Share of each host's burst that background crawls leave for commands
+BACKGROUND_MAX_WAIT = 10.0          # Crawls run off the loop, so they may wait longer before skipping a symbol
+
+# Set while a background crawl fetches, so its requests draw from the lower-priority budget
+background_fetch: contextvars.ContextVar = contextvars.ContextVar('background_fetch', default=False)
+
+
+class HostGuard:
+    """Token-bucket rate limiter and circuit breaker for a single upstream host"""
+    def __init__(self, host: str, rate: float, burst: int):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.state = 'closed'           # closed -> open -> half-open -> closed
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.failures = 0
+        self.rejected_rate_limit = 0
+        self.rejected_breaker = 0
+        self._lock = threading.Lock()
+
+    def _check_breaker(self, now: float) -> None:
+        """Fail fast while the breaker is open or a half-open trial request is running"""
+        if self.state == 'open' and now - self.opened_at < BREAKER_RESET_TIMEOUT:
+            self.rejected_breaker += 1
+            raise UpstreamUnavailable(f"Circuit breaker open for {self.host}")
+        if self.state != 'closed' and self.trial_in_flight:
+            self.rejected_breaker += 1
+            raise UpstreamUnavailable(f"Circuit breaker half-open for {self.host}")
+
+    def acquire(self, max_wait: float = UPSTREAM_MAX_WAIT, reserve: float = 0.0) -> None:
+        """
+        Take a token, waiting up to max_wait; raise UpstreamUnavailable if not possible.
+        A reserve leaves that many tokens in the bucket, so low-priority callers back off first.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._check_breaker(now)
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1 + reserve:
+                    self.tokens -= 1
+                    self.requests += 1
+                    if self.state != 'closed':
+                        # Let a single trial request through to probe the host
+                        self.state = 'half-open'
+                        self.trial_in_flight = True
+                    return
+                sleep_for = (1 + reserve - self.tokens) / self.rate
+                if now + sleep_for > deadline:
+                    self.rejected_rate_limit += 1
+                    raise UpstreamUnavailable(f"Rate limit exceeded for {self.host}")
+            time.sleep(sleep_for)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+            self.state = 'closed'
+
+    def record_abandoned(self) -> None:
+        """The caller gave up (its own deadline passed); not evidence about the host either way"""
+        with self._lock:
+            if self.trial_in_flight:
+                # The probe didn't conclude; let the next request probe again
+                self.trial_in_flight = False
+                self.state = 'open'
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            if self.state == 'half-open' or self.consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'requests': self.requests,
+                'failures': self.failures,
+                'rejected_rate_limit': self.rejected_rate_limit,
+                'rejected_breaker': self.rejected_breaker,
+            }
+
+
+host_guards: Dict[str, HostGuard] = {}
+_host_guards_lock = threading.Lock()
+
+
+def get_host_guard(host: str) -> HostGuard:
+    """Get (or create) the guard for a host"""
+    with _host_guards_lock:
+        guard = host_guards.get(host)
+        if guard is None:
+            rate, burst = UPSTREAM_RATE_LIMITS.get(host, UPSTREAM_DEFAULT_RATE_LIMIT)
+            guard = host_guards[host] = HostGuard(host, rate, burst)
+        return guard
+
+
+def upstream_get(url: str, session=None, **kwargs):
+    """
+    GET an upstream URL through its host's rate limiter and circuit breaker.
+    Raises UpstreamUnavailable without touching the network when the host is shedding load.
+    """
+    host = urlsplit(url).hostname or ''
+    guard = get_host_guard(host)
+    try:
+        if background_fetch.get():
+            guard.acquire(BACKGROUND_MAX_WAIT, reserve=guard.burst * BACKGROUND_TOKEN_RESERVE)
+        else:
+            guard.acquire(deadline_timeout(UPSTREAM_MAX_WAIT))
+    except UpstreamUnavailable:
+        upstream_latency.observe(0.0, host, 'shed')
+        raise
+    requested_timeout = kwargs.get('timeout')
+    try:
+        kwargs['timeout'] = deadline_timeout(requested_timeout)
+    except DeadlineExceeded:
+        # The deadline ran out while we waited for a token; give back a half-open trial we may hold
+        upstream_latency.observe(0.0, host, 'deadline')
+        guard.record_abandoned()
+        raise
+    deadline_capped = kwargs['timeout'] != requested_timeout
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers.setdefault('Accept-Encoding', ACCEPT_ENCODING)
+    kwargs['headers'] = headers
+    started = time.perf_counter()
+    try:
+        with trace_span(f"fetch {host}"):
+            response = (session or requests).get(url, **kwargs)
+    except requests.exceptions.Timeout as e:
+        if not deadline_capped:
+            upstream_latency.observe(time.perf_counter() - started, host, 'error')
+            guard.record_failure()
+            raise
+        # Our own request deadline cut the call short; the host isn't at fault
+        upstream_latency.observe(time.perf_counter() - started, host, 'deadline')
+        guard.record_abandoned()
+        raise DeadlineExceeded(f"request deadline exceeded while fetching {host}") from e
+    except Exception:
+        upstream_latency.observe(time.perf_counter() - started, host, 'error')
+        guard.record_failure()
+        raise
+    upstream_latency.observe(time.perf_counter() - started, host, f"{response.status_code // 100}xx")
+    if response.status_code >= 500 or response.status_code == 429:
+        guard.record_failure()
+    else:
+        guard.record_success()
+    return response
+
+
+# ============================================
+# HTTP Response Cache (on disk, conditional requests)
+# ============================================
+
+def _accept_encoding() -> str:
+    """Advertise brotli only when a decoder is installed (requests/urllib3 decode it transparently)"""
+    for module_name in ('brotli', 'brotlicffi'):
+        try:
+            __import__(module_name)
+            return "br, gzip, deflate"
+        except ImportError:
+            continue
+    return "gzip, deflate"
+
+
+ACCEPT_ENCODING = _accept_encoding()
+
+
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("NTB_HTTP_CACHE_MAX_ENTRIES", "2000"))
+
+
+class HTTPResponseCache:
+    """
+    Disk-backed cache of *parsed* upstream responses keyed by URL.
+    Each entry is a gzip-compressed JSON file holding the decoded payload and the
+    ETag / Last-Modified validators, so a 304 revalidation can skip parsing entirely.
+    The file's mtime is the entry's stored_at, so a revalidation only touches the file;
+    once max_entries is exceeded the least recently stored entries are evicted.
+    """
+    def __init__(self, directory: str, max_entries: int = HTTP_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.stats = {'fresh_hits': 0, 'revalidated': 0, 'stale_served': 0, 'fetched': 0, 'evicted': 0}
+        self._count_lock = threading.Lock()
+        try:
+            self.entry_count = sum(1 for name in os.listdir(directory) if name.endswith('.json.gz'))
+        except OSError:
+            self.entry_count = 0
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json.gz")
+
+    def load(self, url: str) -> Optional[Dict[str, Any]]:
+        """Load an entry for a URL, or None if missing/corrupt"""
+        path = self._path(url)
+        try:
+            stored_at = os.stat(path).st_mtime
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading HTTP cache for {url}: {e}")
+            return None
+        if entry.get('url') != url:
+            return None
+        entry['stored_at'] = stored_at
+        return entry
+
+    def touch(self, url: str) -> None:
+        """Mark an entry as just revalidated without rewriting it"""
+        try:
+            os.utime(self._path(url))
+        except OSError as e:
+            print(f"Error touching HTTP cache for {url}: {e}")
+
+    def store(self, url: str, payload: Any, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Write an entry atomically"""
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'payload': payload,
+        }
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            is_new = not os.path.exists(path)
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                json.dump(entry, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing HTTP cache for {url}: {e}")
+            return
+        if is_new:
+            with self._count_lock:
+                self.entry_count += 1
+                over_limit = self.entry_count > self.max_entries
+            if over_limit:
+                self.evict()
+
+    def evict(self) -> None:
+        """Drop the least recently stored entries until 90% of max_entries remain"""
+        try:
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json.gz')]
+            paths.sort(key=lambda path: os.stat(path).st_mtime)
+        except OSError as e:
+            print(f"Error listing HTTP cache: {e}")
+            return
+        excess = len(paths) - int(self.max_entries * 0.9)
+        removed = 0
+        for path in paths[:max(0, excess)]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        with self._count_lock:
+            self.entry_count = len(paths) - removed
+            self.stats['evicted'] += removed
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats['entries'] = self.entry_count
+        return stats
+
+
+http_cache = HTTPResponseCache(os.path.join(DATA_DIR, 'http'))
+
+
+def cached_fetch(url: str, parse, max_age: Optional[float] = 0, session=None, timeout: float = 10,
+                 max_stale: Optional[float] = None):
+    """
+    Fetch a URL through upstream_get and return parse(response), caching the parsed payload on disk.
+
+    - Entries younger than max_age seconds are returned without any request
+      (max_age=None marks the resource as immutable).
+    - Older entries are revalidated with If-None-Match / If-Modified-Since; a 304
+      returns the stored payload without re-downloading or re-parsing.
+    - If the upstream is unavailable, a stored payload up to max_stale seconds old is
+      served stale (None = any age, 0 = never). Client errors (4xx other than 429)
+      are raised rather than papered over.
+    """
+    with trace_span('http cache'):
+        entry = http_cache.load(url)
+    if entry is not None and (max_age is None or time.time() - entry['stored_at'] < max_age):
+        http_cache.stats['fresh_hits'] += 1
+        return entry['payload']
+
+    headers = {'Accept-Encoding': ACCEPT_ENCODING}
+    if entry is not None:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        response = upstream_get(url, session=session, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            http_cache.stats['revalidated'] += 1
+            http_cache.touch(url)
+            return entry['payload']
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        if entry is None:
+            raise
+        status = e.response.status_code if getattr(e, 'response', None) is not None else None
+        if status is not None and 400 <= status < 500 and status != 429:
+            raise
+        if max_stale is not None and time.time() - entry['stored_at'] > max_stale:
+            raise
+        http_cache.stats['stale_served'] += 1
+        return entry['payload']
+
+    with trace_span('parse'):
+        payload = parse(response)
+    http_cache.stats['fetched'] += 1
+    http_cache.store(url, payload, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return payload
+
+
+# ============================================
+# ShareSansar Pages (parsed once, cached as plain data)
+# ============================================
+
+MARKET_PAGE_MAX_STALE = 1800  # Seconds indices/summary pages may be served stale while the site is down
+
+def _parse_market_tables(response):
+    """All index tables on the ShareSansar market page as rows of cell text"""
+    soup = BeautifulSoup(response.text, "lxml")
+    tables = soup.find_all(
+        "table", class_="table table-bordered table-striped table-hover"
+    )
+    return [
+        [[td.text for td in tr.find_all("td")] for tr in table.find_all("tr")[1:]]
+        for table in tables
+    ]
+
+
+def fetch_market_tables():
+    """ShareSansar /market tables: [0] main indices, [3] sub-indices"""
+    return cached_fetch("https://www.sharesansar.com/market", _parse_market_tables, max_age=15, max_stale=MARKET_PAGE_MAX_STALE)
+
+
+def _parse_market_summary_page(response):
+    """Date and summary cells from the ShareSansar market-summary page"""
+    soup = BeautifulSoup(response.text, "lxml")
+    summary_cont = soup.find("div", id="market_symmary_data")
+    last_mktsum = ""
+    if summary_cont is not None:
+        msdate = summary_cont.find("h5").find("span")
+        if msdate is not None:
+            last_mktsum = msdate.text
+    return {'as_of': last_mktsum, 'cells': [td.text for td in soup.find_all("td")]}
+
+
+def fetch_market_summary_page():
+    """ShareSansar /market-summary as {'as_of': ..., 'cells': [...]}"""
+    return cached_fetch("https://www.sharesansar.com/market-summary", _parse_market_summary_page, max_age=15, max_stale=MARKET_PAGE_MAX_STALE)
+
+
+def _parse_live_trading(response):
+    """Timestamp and stock rows from the ShareSansar live-trading table"""
+    soup = BeautifulSoup(response.text, "lxml")
+    time_stamp = soup.find(id="dDate")
+    rows = []
+    for tr in soup.find_all("tr"):
+        cells = [td.text.strip() for td in tr.find_all("td")]
+        if cells:
+            rows.append(cells)
+    return {
+        'as_of': time_stamp.text if time_stamp is not None else "Date not Found",
+        'rows': rows,
+    }
+
+
+def fetch_live_trading():
+    """ShareSansar /live-trading as {'as_of': ..., 'rows': [[cells], ...]}"""
+    # Live prices are never served stale; callers fall back to another source instead
+    return cached_fetch("https://www.sharesansar.com/live-trading", _parse_live_trading, max_age=5, max_stale=0)
+
+
+def _parse_sharehub_live(response):
+    """Per-company entries from the ShareHub home-page feed"""
+    data = response.json()
+    companies = [
+        item for item in data.get('liveCompanyData', []) or []
+        if isinstance(item, dict) and item.get('symbol')
+    ]
+    return {'as_of': data.get('asOf', 'N/A'), 'companies': companies}
+
+
+def fetch_sharehub_live():
+    """ShareHub Nepal live feed as {'as_of': ..., 'companies': [{...}, ...]}"""
+    return cached_fetch(
+        "https://sharehubnepal.com/live/api/v2/nepselive/home-page-data", _parse_sharehub_live, max_age=5, max_stale=0)
+
+
+# ============================================
+# Persistent Stores (survive restarts)
+# ============================================
+
+
+class PersistentStore:
+    """JSON-backed key/value store with a long TTL that is persisted to disk"""
+    def __init__(self, filename: str, ttl: int):
+        self.path = os.path.join(DATA_DIR, filename)
+        self.ttl = ttl
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.version = 0  # Bumped whenever the contents change, so derived data can be rebuilt
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    def load(self) -> None:
+        """Load entries from disk, keeping expired ones so they can be served stale"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            if isinstance(entries, dict) and entries != self.entries:
+                with self._lock:
+                    self.entries = entries
+                    self.version += 1
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error loading {self.path}: {e}")
+
+    def save(self) -> None:
+        """Write entries to disk atomically if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = dict(self.entries)
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving {self.path}: {e}")
+
+    @contextmanager
+    def transaction(self):
+        """Load, modify and save under a lock file so other processes can't overwrite each other's changes"""
+        with self._file_lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(f"{self.path}.lock", 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self.load()
+                    yield self
+                    self.save()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def is_fresh(self, key: str) -> bool:
+        """Check whether an entry exists and is within its TTL"""
+        entry = self.entries.get(key)
+        return entry is not None and time.time() - entry['timestamp'] < self.ttl
+
+    def get(self, key: str, allow_stale: bool = True) -> Optional[Any]:
+        """Retrieve stored data; expired entries are still returned unless allow_stale is False"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if not allow_stale and not self.is_fresh(key):
+            return None
+        return entry['data']
+
+    def set(self, key: str, data: Any) -> None:
+        """Store data with the current timestamp"""
+        with self._lock:
+            self.entries[key] = {'data': data, 'timestamp': time.time()}
+            self._dirty = True
+            self.version += 1
+
+    def delete(self, key: str) -> None:
+        """Remove an entry"""
+        with self._lock:
+            if self.entries.pop(key, None) is not None:
+                self._dirty = True
+                self.version += 1
+
+    def stale_keys(self, keys: List[str]) -> List[str]:
+        """Return the keys that are missing or past their TTL"""
+        return [key for key in keys if not self.is_fresh(key)]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+async def crawl_symbols(store: PersistentStore, fetch_func, symbols: List[str], concurrency: int = 4) -> int:
+    """Fill a persistent store for every symbol that is missing or expired, with bounded concurrency"""
+    pending = store.stale_keys(symbols)
+    if not pending:
+        return 0
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    skipped = []
+
+    def fetch_in_background(symbol):
+        # Executor threads don't inherit the loop's context, so mark the request here
+        token = background_fetch.set(True)
+        try:
+            return fetch_func(symbol)
+        finally:
+            background_fetch.reset(token)
+
+    async def crawl_one(symbol):
+        async with semaphore:
+            try:
+                data = await loop.run_in_executor(None, fetch_in_background, symbol)
+            except UpstreamUnavailable:
+                # Commands have priority on the host; this symbol is retried on the next crawl
+                skipped.append(symbol)
+                return False
+            except Exception as e:
+                print(f"Error crawling {symbol}: {e}")
+                return False
+        if data is None:
+            return False
+        store.set(symbol, data)
+        return True
+
+    results = await asyncio.gather(*(crawl_one(symbol) for symbol in pending))
+    await loop.run_in_executor(None, store.save)
+    if skipped:
+        print(f"Crawl skipped {len(skipped)} symbols while the upstream was busy")
+    return sum(results)
 
 
 # ============================================
@@ -132,37 +1782,47 @@ def fetch_stock_symbols():
         return cached_symbols
     
     try:
-        response = requests.get(
-            "https://sharehubnepal.com/live/api/v2/nepselive/home-page-data",
-            timeout=10
-        )
-        data = response.json()
-        
-        symbols = []
-        live_data = data.get('liveCompanyData', [])
-        if isinstance(live_data, list):
-            for item in live_data:
-                if isinstance(item, dict) and 'symbol' in item:
-                    symbols.append(item['symbol'])
+        # Same feed the market snapshot is built from, so both share one download
+        symbols = [item['symbol'] for item in fetch_sharehub_live()['companies']]
         
         # Cache the symbols for 1 hour
         market_cache.set('all_symbols', 'stock_symbols', symbols)
         return symbols
     except Exception as e:
         print(f"Error fetching stock symbols: {e}")
-        return []
+        return market_cache.get_stale('all_symbols', 'stock_symbols') or []
 
 
 # ============================================
 # Candlestick Chart Functions
 # ============================================
 
+_chart_libs = None
+_chart_libs_lock = threading.Lock()
+
+
+def load_chart_libs():
+	"""Import pandas, matplotlib (Agg backend) and mplfinance on first use; returns (pd, mpf)"""
+	global _chart_libs
+	if _chart_libs is None:
+		with _chart_libs_lock:
+			if _chart_libs is None:
+				started = time.perf_counter()
+				import pandas as pd
+				import matplotlib
+				matplotlib.use('Agg')  # Use non-GUI backend to prevent threading warnings
+				import mplfinance as mpf
+				_chart_libs = (pd, mpf)
+				startup_timings['chart_libs'] = time.perf_counter() - started
+	return _chart_libs
+
+
 def fetch_chart_data(symbol, page_size, page=1):
 	"""Fetch a single page of data from the ShareHub Nepal API"""
 	url = f"https://sharehubnepal.com/data/api/v1/price-history?pageSize={page_size}&symbol={symbol}&page={page}"
-	resp = requests.get(url, timeout=10)
-	resp.raise_for_status()
-	return resp.json()
+	# The first page gains a row every trading day; older pages only shift once a day
+	max_age = 60 if page == 1 else 900
+	return cached_fetch(url, lambda resp: resp.json(), max_age=max_age, max_stale=86400)
 
 
 def fetch_all_chart_data(symbol, days_needed):
@@ -198,6 +1858,7 @@ def fetch_all_chart_data(symbol, days_needed):
 
 def make_df_from_payload(payload):
 	"""Convert API payload to pandas DataFrame"""
+	pd, _ = load_chart_libs()
 	df = pd.DataFrame(payload['data']['content'])
 	df['date'] = pd.to_datetime(df['date'])
 	df = df.sort_values('date')
@@ -207,6 +1868,7 @@ def make_df_from_payload(payload):
 
 def plot_candlestick(df, symbol, days, filename):
 	"""Generate candlestick chart and save to file"""
+	_, mpf = load_chart_libs()
 	# Custom market colors (Yahoo Finance style)
 	mc = mpf.make_marketcolors(
 		up='#26a69a',
@@ -250,11 +1912,12 @@ def generate_candlestick_chart(symbol, days):
 		if not payload['data']['content']:
 			return None, "No data found for this symbol"
 		
-		df = make_df_from_payload(payload)
-		actual_days = len(df)
-		
-		filename = f"{symbol.lower()}_{actual_days}days_chart.png"
-		plot_candlestick(df, symbol, actual_days, filename)
+		with trace_span('render chart'):
+			df = make_df_from_payload(payload)
+			actual_days = len(df)
+			
+			filename = f"{symbol.lower()}_{actual_days}days_chart.png"
+			plot_candlestick(df, symbol, actual_days, filename)
 		
 		return filename, actual_days
 		
@@ -264,7 +1927,7 @@ def generate_candlestick_chart(symbol, days):
 
 @client.hybrid_command(name='sync', description='Syncs the application commands.')
 async def sync(ctx):
-    await ctx.defer()
+    await defer_command(ctx)
     """just for pylint"""
     # Check if command is used in a guild (not DM)
     if ctx.guild is None:
@@ -280,72 +1943,112 @@ async def sync(ctx):
 
 
 def get_latest_time():
-    response = requests.get(
-        "https://www.sharesansar.com/live-trading", timeout=10)
-    soup = BeautifulSoup(response.text, "lxml")
-    time_stamp = soup.find(id="dDate")
-    if time_stamp is not None:
-        last_updated = time_stamp.text
-    else:
-        last_updated = "Date not Found"
-    return last_updated
+    try:
+        return fetch_live_trading()['as_of']
+    except requests.exceptions.RequestException:
+        return "Date not Found"
 
 
 def extract_stock_name(stock_info):
     return regex.sub(r"\s*\(\s*.*?\s*\)", "", stock_info).strip()
 
 
-def fetch_and_extract_image(url: str):
-    """Fetches the company logo from ShareHub Nepal"""
-    # Try to get from cache first (extract symbol from URL)
-    symbol = url.split('/')[-1].upper() if '/' in url else 'unknown'
-    cached_data = market_cache.get(symbol, 'company_logo')
-    if cached_data:
-        return cached_data
-    
-    # Cache miss - fetch the logo
-    try:
-        resp = requests.get(url, timeout=15)
-        resp.raise_for_status()
-    except Exception as e:
-        print("Request failed:", e)
-        return None
-
-    html = resp.text
-    soup = BeautifulSoup(html, "lxml")
+def _parse_twitter_image(response):
+    """Extract the twitter:image meta content from a company page"""
+    soup = BeautifulSoup(response.text, "lxml")
     meta = soup.find('meta', attrs={'name': 'twitter:image'})
     if not meta:
+        return None
+    return meta.get('content') or None
+
+
+def fetch_and_extract_image(url: str):
+    """
+    Fetches the company logo URL from a ShareHub Nepal company page; None if the page has no logo.
+    Request failures propagate so an outage isn't mistaken for a missing logo.
+    """
+    content = cached_fetch(url, _parse_twitter_image, timeout=15)
+    if not content:
         print("Meta tag 'twitter:image' not found")
         return None
+    return content
+
+
+# ============================================
+# Company Logo Index (persisted, refreshed in background)
+# ============================================
+
+COMPANY_LOGO_TTL = 7 * 24 * 3600  # 7 days - logos rarely change
+LOGO_CRAWL_CONCURRENCY = 4        # Parallel ShareHub page fetches during a crawl
+PENDING_LOGO_MAX = 200            # Cap on symbols queued from the command path between crawls
 
-    content = meta.get('content')
-    # Store in cache before returning (1 hour TTL)
-    if content:
-        market_cache.set(symbol, 'company_logo', content)
-    return content
+company_logos = PersistentStore('company_logos.json', COMPANY_LOGO_TTL)
+# Symbols requested on the command path that are not in the index yet
+pending_logo_symbols = set()
 
 
-@client.hybrid_command(name='nepse', description='get details on nepse')
-async def nepse(ctx):
-    """
-    Retrieves the latest NEPSE indices data and sends it as an embed message.
-    """
-    await ctx.defer()
-    # Fetch the webpage content
-    url = "https://www.sharesansar.com/market"  # URL to scrape
-    response = requests.get(url, timeout=10)
-    soup = BeautifulSoup(response.text, "lxml")
+def fetch_company_logo(symbol):
+    """Fetch the logo URL for a symbol from its ShareHub company page"""
+    symbol = symbol.strip().upper()
+    if market_cache.is_negative(symbol, 'company_logo'):
+        return None
+    logo_url = fetch_and_extract_image(f"https://sharehubnepal.com/company/{symbol}")
+    if logo_url is None:
+        # The page loaded without a logo; failed requests raised above and are retried next crawl
+        market_cache.set_negative(symbol, 'company_logo')
+    return logo_url
+
+
+def get_company_logo(symbol):
+    """Look up a company logo in the local index; never touches the network"""
+    symbol = symbol.strip().upper()
+    logo_url = company_logos.get(symbol)
+    if logo_url is None and len(pending_logo_symbols) < PENDING_LOGO_MAX and resolve_symbol(symbol)[0]:
+        # Let the background crawler pick up listed symbols on its next run
+        pending_logo_symbols.add(symbol)
+    return logo_url
+
+
+@tasks.loop(minutes=30)
+async def refresh_company_logos():
+    """Fetch logos for every listed symbol whose index entry is missing or expired"""
+    if not leader_lease.is_leader:
+        # The leader crawls; followers pick up its results from disk
+        pending_logo_symbols.clear()
+        company_logos.load()
+        return
+    symbols = await client.loop.run_in_executor(None, fetch_stock_symbols)
+    symbols = list(dict.fromkeys(list(symbols) + sorted(pending_logo_symbols)))
+    pending_logo_symbols.clear()
+    if not symbols:
+        return
+    refreshed = await crawl_symbols(company_logos, fetch_company_logo, symbols, LOGO_CRAWL_CONCURRENCY)
+    if refreshed:
+        print(f"Company logos: refreshed {refreshed} symbols ({len(company_logos)} stored)")
 
-    # Find the table that contains the indices data
-    all_tables = soup.find_all(
-        "table", class_="table table-bordered table-striped table-hover"
-    )
-    # Assuming the first table is the main indices
-    main_indices = all_tables[0]
 
-    # Extract all the rows (skipping the header)
-    main_indices_rows = main_indices.find_all("tr")[1:]
+def get_nepse_indices() -> List[IndexRow]:
+    """Main NEPSE index rows"""
+    # Try to get from cache first
+    cached_data = market_cache.get('main', 'nepse_indices')
+    if cached_data:
+        return cached_data
 
+    # Cache miss - the first table on the market page is the main indices
+    try:
+        all_tables = fetch_market_tables()
+    except UpstreamUnavailable:
+        stale = market_cache.get_stale('main', 'nepse_indices')
+        if stale is None:
+            raise
+        return stale
+    rows = [IndexRow.from_cells(row) for row in all_tables[0]]
+    market_cache.set('main', 'nepse_indices', rows)
+    return rows
+
+
+def build_nepse_embed(main_indices_rows):
+    """Build the NEPSE indices embed (the footer is added per caller)"""
     # Create an embed object with better formatting
     embed = discord.Embed(
         title="📊 NEPSE Index Data",
@@ -354,34 +2057,24 @@ async def nepse(ctx):
     )
 
     # Iterate through each row and extract the data
-    for idx, tr in enumerate(main_indices_rows):
-        tds = tr.find_all("td")
-        index_name = tds[0].text.strip()
-        open_val = tds[1].text.strip()
-        high_val = tds[2].text.strip()
-        low_val = tds[3].text.strip()
-        close_val = tds[4].text.strip()
-        point_change = tds[5].text.strip()
-        pct_change = tds[6].text.strip()
-        turnover = tds[7].text.strip()
-        
+    for idx, row in enumerate(main_indices_rows):
         # Determine trend emoji
-        try:
-            pct_float = float(pct_change.replace('%', '').replace('+', ''))
-            trend_emoji = "📈" if pct_float > 0 else "📉" if pct_float < 0 else "➡️"
-            color_indicator = "🟢" if pct_float > 0 else "🔴" if pct_float < 0 else "⚪"
-        except:
+        pct_float = row.pct_change
+        if pct_float is None:
             trend_emoji = "📊"
             color_indicator = "⚪"
+        else:
+            trend_emoji = "📈" if pct_float > 0 else "📉" if pct_float < 0 else "➡️"
+            color_indicator = "🟢" if pct_float > 0 else "🔴" if pct_float < 0 else "⚪"
         
         # Add each index's data as a field in the embed
         embed.add_field(
-            name=f"{color_indicator} {index_name}",
+            name=f"{color_indicator} {row.name}",
             value=(
-                f"**Close:** {close_val} {trend_emoji}\n"
-                f"**Change:** {point_change} ({pct_change})\n"
-                f"**Range:** {low_val} - {high_val}\n"
-                f"**Turnover:** {format_number(turnover)}"
+                f"**Close:** {_format_price(row.close)} {trend_emoji}\n"
+                f"**Change:** {_format_price(row.pt_change)} ({_format_pct(row.pct_change)})\n"
+                f"**Range:** {_format_price(row.low)} - {_format_price(row.high)}\n"
+                f"**Turnover:** {format_number(row.turnover)}"
             ),
             inline=True
         )
@@ -393,9 +2086,23 @@ async def nepse(ctx):
                 value="",
                 inline=False
             )
+    return embed
+
+
+@client.hybrid_command(name='nepse', description='get details on nepse')
+async def nepse(ctx):
+    """
+    Retrieves the latest NEPSE indices data and sends it as an embed message.
+    """
+    await defer_command(ctx)
+    main_indices_rows, as_of = await gather_blocking((get_nepse_indices,), (get_ss_time,), executor=io_executor)
+
+    # Reuse the rendered embed until the indices snapshot changes
+    version = (market_cache.get_version('main', 'nepse_indices'), as_of)
+    embed = embed_cache.get_or_build('nepse', version, lambda: build_nepse_embed(main_indices_rows))
 
     embed.set_footer(
-        text=f"As of: {get_ss_time()} • Data from ShareSansar",
+        text=f"As of: {as_of} • Data from ShareSansar",
         icon_url=ctx.author.avatar.url if ctx.author.avatar else None
     )
 
@@ -404,36 +2111,30 @@ async def nepse(ctx):
 
 
 def get_ss_time():
-    response3 = requests.get(
-        "https://www.sharesansar.com/market-summary", timeout=10)
-    soup3 = BeautifulSoup(response3.text, "lxml")
-    summary_cont = soup3.find("div", id="market_symmary_data")
-    last_mktsum = ""
-    if summary_cont is not None:
-        msdate = summary_cont.find("h5").find("span")
-        if msdate is not None:
-            last_mktsum = msdate.text
-    return last_mktsum
+    try:
+        return fetch_market_summary_page()['as_of']
+    except requests.exceptions.RequestException:
+        return ""
 
 
-def get_sub_index_details(subindex_name):
+def get_sub_index_details(subindex_name) -> Optional[IndexRow]:
     subindex_name = subindex_name.upper()
+    cache_key = subindex_name
     
     # Try to get from cache first
-    cached_data = market_cache.get(subindex_name, 'sub_indices')
+    cached_data = market_cache.get(cache_key, 'sub_indices')
     if cached_data:
         return cached_data
+    if market_cache.is_negative(cache_key, 'sub_indices'):
+        return None
     
-    # Cache miss - scrape the data
-    response4 = requests.get("https://www.sharesansar.com/market", timeout=10)
-    soup4 = BeautifulSoup(response4.text, "lxml")
-    alltable = soup4.find_all(
-        "table", class_="table table-bordered table-striped table-hover"
-    )
-    sub_indices = alltable[3]
-    sub_indices_rows = sub_indices.find_all("tr")
-    for tr in sub_indices_rows[1:]:
-        tds = tr.find_all("td")
+    # Cache miss - scrape the data (serve stale if ShareSansar is shedding load)
+    try:
+        alltable = fetch_market_tables()
+    except UpstreamUnavailable:
+        return market_cache.get_stale(cache_key, 'sub_indices')
+    sub_indices_rows = alltable[3]
+    for tds in sub_indices_rows:
         sub_index_mapping = {
             "BANKING": "Banking SubIndex",
             "DEVBANK": "Development Bank Index",
@@ -450,20 +2151,12 @@ def get_sub_index_details(subindex_name):
             "TRADING": "Trading Index",
         }
         subindex_name = sub_index_mapping.get(subindex_name, subindex_name)
-        if tds[0].text.upper() == subindex_name.upper():
-            sub_index_details = {
-                "Sub Index": tds[0].text,
-                "Open": tds[1].text,
-                "High": tds[2].text,
-                "Low": tds[3].text,
-                "close": tds[4].text,
-                "Pt.Change": tds[5].text,
-                "% change": tds[6].text,
-                "Turnover": tds[7].text,
-            }
+        if tds[0].upper() == subindex_name.upper():
+            sub_index_details = IndexRow.from_cells(tds)
             # Store in cache before returning
-            market_cache.set(subindex_name, 'sub_indices', sub_index_details)
+            market_cache.set(cache_key, 'sub_indices', sub_index_details)
             return sub_index_details
+    market_cache.set_negative(cache_key, 'sub_indices')
     return None
 
 
@@ -488,26 +2181,29 @@ subindex_options = [
 @client.hybrid_command(name='subidx', description='Get subindex details')
 @app_commands.describe(subindex_name='The name of the subindex')
 async def subidx(ctx, *, subindex_name: str):
-    await ctx.defer()
-    sub_index_details = get_sub_index_details(subindex_name)
+    await defer_command(ctx)
+    sub_index_details, as_of = await gather_blocking(
+        (get_sub_index_details, subindex_name), (get_ss_time,), executor=io_executor)
     if sub_index_details is None:
         await ctx.reply(f"The particular subindex : `{subindex_name}` doesn't exist or there might be a typo.🤔\nPlease use `!helpntb` to see the correct format! 📜")
         return
-    o = round(float(sub_index_details["Open"].replace(",", "")), 2)
-    h = round(float(sub_index_details["High"].replace(",", "")), 2)
-    c = round(float(sub_index_details["close"].replace(",", "")), 2)
+    row = sub_index_details
+    o, h, c = row.open or 0.0, row.high or 0.0, row.close or 0.0
     embedcolor = discord.Color.red() if o > c or o > h else discord.Color.green()
     embed = discord.Embed(
-        title=f"Data for {sub_index_details['Sub Index']}", color=embedcolor
+        title=f"Data for {row.name}", color=embedcolor
     )
-    for key in list(sub_index_details.keys())[1:]:
-
-        embed.add_field(
-            name=key,
-            value=sub_index_details[key],
-            inline=True,
-        )
-    embed.set_footer(text=f"As of: {get_ss_time()}")
+    for name, value in (
+        ("Open", _format_price(row.open)),
+        ("High", _format_price(row.high)),
+        ("Low", _format_price(row.low)),
+        ("close", _format_price(row.close)),
+        ("Pt.Change", _format_price(row.pt_change)),
+        ("% change", _format_pct(row.pct_change)),
+        ("Turnover", _format_price(row.turnover)),
+    ):
+        embed.add_field(name=name, value=value, inline=True)
+    embed.set_footer(text=f"As of: {as_of}")
     await ctx.reply(embed=embed)
 
 
@@ -519,20 +2215,203 @@ async def subindex_autocomplete(interaction: discord.Interaction, current: str):
     return [app_commands.Choice(name=key, value=key) for key in options]
 
 
+# ============================================
+# Symbol Index (autocomplete)
+# ============================================
+
+class SymbolIndex:
+    """Prebuilt sorted-prefix and trigram index over symbols and company names"""
+    def __init__(self, symbols: List[str] = (), names: Optional[Dict[str, str]] = None):
+        self.symbols = sorted({s.upper() for s in symbols})
+        self.symbol_set = frozenset(self.symbols)
+        self.names = names or {}
+        self.name_trigrams: Dict[str, set] = {}
+        for symbol, name in self.names.items():
+            for gram in self._trigrams(name):
+                self.name_trigrams.setdefault(gram, set()).add(symbol)
+        # Symbol bigrams narrow the candidates for "did you mean" suggestions
+        self.symbol_bigrams: Dict[str, set] = {}
+        for symbol in self.symbols:
+            for gram in self._bigrams(symbol):
+                self.symbol_bigrams.setdefault(gram, set()).add(symbol)
+
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        padded = f" {' '.join(text.lower().split())} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    @staticmethod
+    def _bigrams(symbol: str) -> set:
+        padded = f"^{symbol}$"
+        return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+    @staticmethod
+    def _edit_distance(a: str, b: str) -> int:
+        """Optimal string alignment distance (Levenshtein plus adjacent transpositions)"""
+        previous2 = None
+        previous = list(range(len(b) + 1))
+        for i in range(1, len(a) + 1):
+            current = [i] + [0] * len(b)
+            for j in range(1, len(b) + 1):
+                cost = 0 if a[i - 1] == b[j - 1] else 1
+                current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+                if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                    current[j] = min(current[j], previous2[j - 2] + 1)
+            previous2, previous = previous, current
+        return previous[-1]
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.symbol_set
+
+    def suggest(self, query: str, limit: int = 3) -> List[str]:
+        """Closest known symbols to a mistyped one"""
+        query = query.strip().upper()
+        overlap: Dict[str, int] = {}
+        for gram in self._bigrams(query):
+            for symbol in self.symbol_bigrams.get(gram, ()):
+                overlap[symbol] = overlap.get(symbol, 0) + 1
+        max_distance = 1 if len(query) <= 3 else 2
+        scored = []
+        for symbol, shared in overlap.items():
+            if abs(len(symbol) - len(query)) > max_distance:
+                continue
+            distance = self._edit_distance(query, symbol)
+            if distance <= max_distance:
+                scored.append((distance, -shared, symbol))
+        scored.sort()
+        return [symbol for _, _, symbol in scored[:limit]]
+
+    def label(self, symbol: str) -> str:
+        """Choice label: symbol plus company name when known (Discord caps names at 100 chars)"""
+        name = self.names.get(symbol)
+        return f"{symbol} — {name}"[:100] if name else symbol
+
+    def search(self, query: str, limit: int = 25) -> List[str]:
+        """Symbols ranked by: symbol prefix, company-name match, then symbol substring"""
+        upper_query = query.strip().upper()
+        if not upper_query:
+            return self.symbols[:limit]
+
+        results = []
+        seen = set()
+
+        def add(symbol):
+            if symbol not in seen:
+                seen.add(symbol)
+                results.append(symbol)
+
+        # 1. Symbol prefix matches via binary search on the sorted array
+        i = bisect_left(self.symbols, upper_query)
+        while i < len(self.symbols) and self.symbols[i].startswith(upper_query) and len(results) < limit:
+            add(self.symbols[i])
+            i += 1
+
+        # 2. Company-name matches ranked by trigram overlap ("nabil bank" -> NABIL)
+        if len(results) < limit and len(upper_query) >= 3:
+            grams = self._trigrams(query)
+            scores: Dict[str, int] = {}
+            for gram in grams:
+                for symbol in self.name_trigrams.get(gram, ()):
+                    scores[symbol] = scores.get(symbol, 0) + 1
+            threshold = max(2, len(grams) // 2)
+            ranked = sorted(
+                (symbol for symbol, score in scores.items() if score >= threshold),
+                key=lambda symbol: (-scores[symbol], symbol)
+            )
+            for symbol in ranked[:limit - len(results)]:
+                add(symbol)
+
+        # 3. Symbol substring matches (previous behaviour)
+        if len(results) < limit:
+            for symbol in self.symbols:
+                if upper_query in symbol:
+                    add(symbol)
+                    if len(results) >= limit:
+                        break
+        return results[:limit]
+
+
+# Swapped atomically by the background rebuild; lookups never touch the network
+symbol_index = SymbolIndex()
+_symbol_index_signature = None
+
+
+def build_symbol_index(symbols):
+    """Build a new index from the symbol list and known company names"""
+    names = {}
+    for symbol in symbols:
+        details = company_metadata.get(symbol.upper())
+        if details and details.get("company fullform"):
+            names[symbol.upper()] = extract_stock_name(details["company fullform"])
+    return SymbolIndex(symbols, names)
+
+
+def fetch_symbol_universe():
+    """
+    Every symbol a source knows about: ShareHub's list, plus ShareSansar's live table and
+    the company metadata store, so a symbol missing from one feed is still accepted
+    """
+    symbols = dict.fromkeys(symbol.upper() for symbol in fetch_stock_symbols())
+    try:
+        symbols.update(dict.fromkeys(
+            row[1].strip().upper() for row in fetch_live_trading()['rows'] if len(row) > 1 and row[1].strip()))
+    except requests.exceptions.RequestException as e:
+        print(f"Symbol index: ShareSansar live table unavailable ({e})")
+    symbols.update(dict.fromkeys(company_metadata.entries))
+    return list(symbols)
+
+
+@tasks.loop(minutes=5)
+async def refresh_symbol_index():
+    """Rebuild the autocomplete index when the symbol list or company names change"""
+    global symbol_index, _symbol_index_signature
+    symbols = await client.loop.run_in_executor(None, fetch_symbol_universe)
+    if not symbols:
+        return
+    # Any metadata change (not just its size) can rename a company
+    signature = (tuple(sorted(symbols)), company_metadata.version)
+    if signature == _symbol_index_signature:
+        return
+    symbol_index = await client.loop.run_in_executor(cpu_executor, build_symbol_index, symbols)
+    _symbol_index_signature = signature
+    print(f"Symbol index rebuilt: {len(symbol_index)} symbols, {len(symbol_index.names)} company names")
+
+
+def resolve_symbol(stock_name):
+    """
+    Validate a symbol against the cached symbol universe without any network traffic.
+    Returns (symbol, []) if it is listed (or the universe isn't loaded yet),
+    otherwise (None, suggestions).
+    """
+    symbol = stock_name.strip().upper()
+    index = symbol_index
+    if not len(index) or symbol in index:
+        return symbol, []
+    return None, index.suggest(symbol)
+
+
+def symbol_not_found_embed(stock_name, suggestions):
+    """Embed for an unknown symbol with "did you mean" suggestions"""
+    description = f"Stock **{stock_name.strip().upper()}** doesn't exist or there may be a typo."
+    if suggestions:
+        description += "\n\n💡 **Did you mean:** " + ", ".join(f"`{s}`" for s in suggestions) + "?"
+    return discord.Embed(
+        title="❌ Stock Not Found",
+        description=description,
+        color=discord.Color.red()
+    )
+
+
 async def stock_autocomplete(interaction: discord.Interaction, current: str):
-    """Autocomplete function for stock symbols"""
-    # Fetch all available stock symbols
-    symbols = fetch_stock_symbols()
-    
-    # Filter symbols based on user input (case-insensitive)
-    current_upper = current.upper()
-    filtered = [s for s in symbols if current_upper in s.upper()]
-    
-    # Discord allows max 25 choices, so limit results
-    filtered = filtered[:25]
-    
-    # Return as Choice objects
-    return [app_commands.Choice(name=symbol, value=symbol) for symbol in filtered]
+    """Autocomplete function for stock symbols (served from the in-memory index)"""
+    index = symbol_index
+    return [
+        app_commands.Choice(name=index.label(symbol), value=symbol)
+        for symbol in index.search(current, limit=25)
+    ]
 
 
 # ============================================
@@ -553,8 +2432,11 @@ class StockActionButtons(discord.ui.View):
         
         # Generate chart with default 90 days
         days = 90
-        loop = interaction.client.loop
-        filename, result = await loop.run_in_executor(None, generate_candlestick_chart, self.symbol.upper(), days)
+        try:
+            filename, result = await run_blocking(generate_candlestick_chart, self.symbol.upper(), days, executor=render_executor)
+        except ExecutorSaturated:
+            await interaction.followup.send("⏳ Too many charts are being drawn right now. Please try again in a moment.", ephemeral=True)
+            return
         
         if filename is None:
             # Error occurred
@@ -568,7 +2450,7 @@ class StockActionButtons(discord.ui.View):
         
         try:
             # Get latest price info from the data
-            payload = fetch_all_chart_data(self.symbol.upper(), 1)
+            payload = await run_blocking(fetch_all_chart_data, self.symbol.upper(), 1, executor=io_executor)
             latest = payload['data']['content'][0] if payload['data']['content'] else {}
             
             current_price = latest.get('close', 'N/A')
@@ -576,9 +2458,8 @@ class StockActionButtons(discord.ui.View):
             change_percent = latest.get('changePercent', 'N/A')
             volume = latest.get('volume', 'N/A')
             
-            # Fetch company logo
-            company_url = f"https://sharehubnepal.com/company/{self.symbol.strip().upper()}"
-            img_url = await loop.run_in_executor(None, fetch_and_extract_image, company_url)
+            # Company logo from the local index
+            img_url = get_company_logo(self.symbol)
             
             # Format change color
             if isinstance(change, (int, float)):
@@ -707,8 +2588,11 @@ class ViewChartButton(discord.ui.View):
         
         # Generate chart with default 90 days
         days = 90
-        loop = interaction.client.loop
-        filename, result = await loop.run_in_executor(None, generate_candlestick_chart, self.symbol.upper(), days)
+        try:
+            filename, result = await run_blocking(generate_candlestick_chart, self.symbol.upper(), days, executor=render_executor)
+        except ExecutorSaturated:
+            await interaction.followup.send("⏳ Too many charts are being drawn right now. Please try again in a moment.", ephemeral=True)
+            return
         
         if filename is None:
             # Error occurred
@@ -722,7 +2606,7 @@ class ViewChartButton(discord.ui.View):
         
         try:
             # Get latest price info from the data
-            payload = fetch_all_chart_data(self.symbol.upper(), 1)
+            payload = await run_blocking(fetch_all_chart_data, self.symbol.upper(), 1, executor=io_executor)
             latest = payload['data']['content'][0] if payload['data']['content'] else {}
             
             current_price = latest.get('close', 'N/A')
@@ -730,9 +2614,8 @@ class ViewChartButton(discord.ui.View):
             change_percent = latest.get('changePercent', 'N/A')
             volume = latest.get('volume', 'N/A')
             
-            # Fetch company logo
-            company_url = f"https://sharehubnepal.com/company/{self.symbol.strip().upper()}"
-            img_url = await loop.run_in_executor(None, fetch_and_extract_image, company_url)
+            # Company logo from the local index
+            img_url = get_company_logo(self.symbol)
             
             # Format change color
             if isinstance(change, (int, float)):
@@ -784,226 +2667,871 @@ class ViewChartButton(discord.ui.View):
                 os.remove(filename)
 
 
-def get_stock_details(stock_name):
-    # if stock_name.upper()=="NEPSE":
-    #     return None
-    
-    # Try to get from cache first
-    cached_data = market_cache.get(stock_name.upper(), 'stock_details')
-    if cached_data:
-        return cached_data
+# ============================================
+# Company Metadata (sector, registrar, full name)
+# ============================================
 
-    import cloudscraper
-    scraper = cloudscraper.create_scraper()
-    
-    upper_stonk = stock_name.upper()
-    stock_price_data = None
-    use_json_api = True
-    
-    # Try to fetch live price data from NepseAlpha API
-    try:
-        response = scraper.get('https://nepsealpha.com/live/stocks', timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            prices = data.get('stock_live', {}).get('prices', [])
-            
-            # Find the stock in the price data
-            for item in prices:
-                if item.get('symbol', '').upper() == upper_stonk:
-                    stock_price_data = item
-                    break
-    except Exception as e:
-        print(f"Error fetching from NepseAlpha API: {e}")
-        use_json_api = False
-    
-    # If JSON API fails or stock not found, fall back to ShareSansar scraping for price data
-    if not stock_price_data:
-        use_json_api = False
-    
-    # If JSON API fails or stock not found, fall back to ShareSansar scraping for price data
-    if not stock_price_data:
-        use_json_api = False
-    
-    # Fetch company details (sector, registrar, company fullform) from ShareSansar
+COMPANY_METADATA_TTL = 7 * 24 * 3600  # 7 days - sector/registrar/name almost never change
+COMPANY_CRAWL_CONCURRENCY = 4         # Parallel company-page scrapes during a crawl
+
+company_metadata = PersistentStore('company_metadata.json', COMPANY_METADATA_TTL)
+
+
+def _parse_company_page(response):
+    """Extract sector, share registrar and company full name from a ShareSansar company page"""
     company_details = {
         "sector": "N/A",
         "share registrar": "N/A",
-        "company fullform": upper_stonk,
+        "company fullform": None,
     }
+    soup = BeautifulSoup(response.text, "lxml")
+    all_rows = soup.find_all("div", class_="row")
     
-    # Variables for fallback data
-    stock_details_fallback = None
+    if len(all_rows) >= 6:
+        info_row = all_rows[5]
+        second_row = info_row.find_all("div", class_="col-md-12")
+        if len(second_row) > 1:
+            shareinfo = second_row[1]
+            heading_list = shareinfo.find_all("h4")
+            
+            if len(heading_list) > 2:
+                company_details["sector"] = heading_list[1].find("span", class_="text-org").text
+                company_details["share registrar"] = heading_list[2].find("span", class_="text-org").text
     
+    company_full_form_tag = soup.find(
+        "h1", style="color: #333;font-size: 20px;font-weight: 600;"
+    )
+    if company_full_form_tag is not None:
+        company_details["company fullform"] = company_full_form_tag.text
+    return company_details
+
+
+def fetch_company_details(symbol):
+    """Scrape sector, share registrar and company full name from ShareSansar"""
     try:
-        response2 = requests.get(
-            f"https://www.sharesansar.com/company/{stock_name}", timeout=10)
-        
-        if response2.status_code == 200:
-            soup2 = BeautifulSoup(response2.text, "lxml")
-            all_rows = soup2.find_all("div", class_="row")
-            
-            if len(all_rows) >= 6:
-                info_row = all_rows[5]
-                second_row = info_row.find_all("div", class_="col-md-12")
-                if len(second_row) > 1:
-                    shareinfo = second_row[1]
-                    heading_list = shareinfo.find_all("h4")
-                    
-                    if len(heading_list) > 2:
-                        company_details["sector"] = heading_list[1].find("span", class_="text-org").text
-                        company_details["share registrar"] = heading_list[2].find("span", class_="text-org").text
-            
-            company_full_form_tag = soup2.find(
-                "h1", style="color: #333;font-size: 20px;font-weight: 600;"
-            )
-            if company_full_form_tag is not None:
-                company_details["company fullform"] = company_full_form_tag.text
+        company_details = cached_fetch(
+            f"https://www.sharesansar.com/company/{symbol}", _parse_company_page)
+    except UpstreamUnavailable:
+        raise  # Shedding load: crawls skip the symbol, the command path falls back below
     except Exception as e:
         print(f"Error fetching company details from ShareSansar: {e}")
-    
-    # If we need to fall back to ShareSansar for price data
-    if not use_json_api:
-        try:
-            response_live = requests.get(
-                "https://www.sharesansar.com/live-trading", timeout=10)
-            
-            if response_live.status_code == 200:
-                soup = BeautifulSoup(response_live.text, "lxml")
-                stock_rows = soup.find_all("tr")
-                time_stamp = soup.find(id="dDate")
-                last_updated = time_stamp.text if time_stamp is not None else "Date not Found"
-                
-                for row in stock_rows[1:]:
-                    row_data = row.find_all("td")
-                    
-                    if len(row_data) > 9 and row_data[1].text.strip() == upper_stonk:
-                        stock_details_fallback = {
-                            "Symbol": row_data[1].text.strip(),
-                            "Last Traded Price": row_data[2].text.strip(),
-                            "Pt Change": row_data[3].text.strip(),
-                            "% Change": row_data[4].text.strip(),
-                            "Open": row_data[5].text.strip(),
-                            "High": row_data[6].text.strip(),
-                            "Low": row_data[7].text.strip(),
-                            "Volume": row_data[8].text.strip(),
-                            "Prev.Closing": row_data[9].text.strip(),
-                            "As of": last_updated,
-                            "Sector": company_details["sector"],
-                            "Share Registrar": company_details["share registrar"],
-                            "Company fullform": company_details["company fullform"],
-                        }
-                        # Indicate fallback was used
-                        print(f"STONK: Using fallback (ShareSansar) for {upper_stonk}")
-                        market_cache.set(stock_name.upper(), 'stock_details', stock_details_fallback)
-                        return stock_details_fallback
-        except Exception as e:
-            print(f"Error fetching from ShareSansar live-trading: {e}")
-        
-        # If fallback also failed
         return None
-    
-    # Extract price data from JSON API
-    close_price = stock_price_data.get("close", 0)
-    open_price = stock_price_data.get("open", 0)
-    high_price = stock_price_data.get("high", 0)
-    low_price = stock_price_data.get("low", 0)
-    volume = stock_price_data.get("volume", 0)
-    percent_change = stock_price_data.get("percent_change", 0)
-    
-    # Calculate previous close and point change
-    # Formula: prev_close = close / (1 + percent_change/100)
-    # Point Change = close - prev_close
+
+    company_details = dict(company_details)
+    company_details["company fullform"] = company_details["company fullform"] or symbol.upper()
+    return company_details
+
+
+def get_company_details(symbol):
+    """Get company metadata from the persistent store, scraping only on a cold miss"""
+    symbol = symbol.upper()
+    company_details = company_metadata.get(symbol)
+    if company_details is not None:
+        return company_details
+
     try:
-        if percent_change != 0 and close_price != 0:
-            prev_close = close_price / (1 + percent_change / 100)
-            pt_change = close_price - prev_close
-        else:
-            prev_close = close_price
-            pt_change = 0
-    except (TypeError, ZeroDivisionError):
-        prev_close = close_price
-        pt_change = 0
-    
-    # Format values with proper number formatting
-    stock_details = {
-        "Symbol": stock_price_data.get("symbol", "N/A"),
-        "Last Traded Price": f"{close_price:,.2f}" if isinstance(close_price, (int, float)) else "N/A",
-        "Pt Change": f"{pt_change:,.2f}" if isinstance(pt_change, (int, float)) else "N/A",
-        "% Change": f"{percent_change:.2f}%" if isinstance(percent_change, (int, float)) else "N/A",
-        "Open": f"{open_price:,.2f}" if isinstance(open_price, (int, float)) else "N/A",
-        "High": f"{high_price:,.2f}" if isinstance(high_price, (int, float)) else "N/A",
-        "Low": f"{low_price:,.2f}" if isinstance(low_price, (int, float)) else "N/A",
-        "Volume": f"{int(volume):,}" if isinstance(volume, (int, float)) else "N/A",
-        "Prev.Closing": f"{prev_close:,.2f}" if isinstance(prev_close, (int, float)) else "N/A",
-        "As of": data.get('stock_live', {}).get('asOf', 'N/A'),
-        "Sector": company_details["sector"],
-        "Share Registrar": company_details["share registrar"],
-        "Company fullform": company_details["company fullform"],
-    }
-    # Indicate JSON/hybrid method was used
+        company_details = fetch_company_details(symbol)
+    except UpstreamUnavailable:
+        company_details = None
+    if company_details is None:
+        return {
+            "sector": "N/A",
+            "share registrar": "N/A",
+            "company fullform": symbol,
+        }
+    company_metadata.set(symbol, company_details)
+    company_metadata.save()
+    return company_details
+
+
+@tasks.loop(hours=6)
+async def refresh_company_metadata():
+    """Crawl company pages for every listed symbol whose metadata is missing or expired"""
+    if not leader_lease.is_leader:
+        # The leader crawls; followers pick up its results from disk
+        company_metadata.load()
+        return
+    symbols = await client.loop.run_in_executor(None, fetch_stock_symbols)
+    if not symbols:
+        return
+    refreshed = await crawl_symbols(company_metadata, fetch_company_details, symbols, COMPANY_CRAWL_CONCURRENCY)
+    print(f"Company metadata: refreshed {refreshed} symbols ({len(company_metadata)} stored)")
+
+
+# ============================================
+# Market Snapshot (whole board as NumPy columns)
+# ============================================
+
+MARKET_SNAPSHOT_MAX_AGE = 5  # Seconds; matches the live feeds' own cache age
+# Columns /screen and /topgl rank on; ShareHub's field names are guessed, so a feed missing any of them is rejected
+MARKET_SNAPSHOT_REQUIRED_COLUMNS = ('ltp', 'pct_change', 'volume')
+# Float64 columns; NaN where the source doesn't report a value
+MARKET_SNAPSHOT_COLUMNS = ('ltp', 'pt_change', 'pct_change', 'open', 'high', 'low',
+                           'volume', 'prev_close', 'turnover', 'trades')
+QUOTE_COLUMNS = MARKET_SNAPSHOT_COLUMNS[:8]  # The ones a Quote carries
+
+
+class MarketSnapshot:
+    """
+    The live board for every listed symbol, stored column-wise so market-wide
+    questions (rankings, screens, sector sums) are single NumPy operations over
+    a few hundred rows instead of loops over per-symbol dicts.
+    """
+    __slots__ = ('as_of', 'source', 'symbols', 'index', 'columns', 'sector_codes', 'sectors', 'built_in')
+
+    def __init__(self, as_of: str, source: str, quotes: List[Quote],
+                 turnover: Optional[List[Optional[float]]] = None,
+                 trades: Optional[List[Optional[float]]] = None):
+        self.as_of = as_of
+        self.source = source
+        self.symbols = np.array([quote.symbol for quote in quotes], dtype=object)
+        self.index = {symbol: row for row, symbol in enumerate(self.symbols)}
+        self.columns = {
+            name: np.array([getattr(quote, name) for quote in quotes], dtype=np.float64)
+            for name in QUOTE_COLUMNS
+        }
+        missing = [None] * len(quotes)
+        self.columns['turnover'] = np.array(turnover or missing, dtype=np.float64)
+        self.columns['trades'] = np.array(trades or missing, dtype=np.float64)
+
+        # Sector as a small integer code per row (-1 = unknown) from the company metadata store
+        self.sectors: List[str] = []
+        sector_ids: Dict[str, int] = {}
+        codes = np.full(len(quotes), -1, dtype=np.int16)
+        for row, symbol in enumerate(self.symbols):
+            details = company_metadata.get(symbol)
+            sector = details.get('sector') if details else None
+            if not sector or sector == 'N/A':
+                continue
+            if sector not in sector_ids:
+                sector_ids[sector] = len(self.sectors)
+                self.sectors.append(sector)
+            codes[row] = sector_ids[sector]
+        self.sector_codes = codes
+        self.built_in = 0.0
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def value(self, name: str, row: int) -> Optional[float]:
+        """One cell as a float, or None where the source had no value (never NaN)"""
+        number = self.columns[name][row]
+        return None if np.isnan(number) else float(number)
+
+    def quote(self, symbol: str) -> Optional[Quote]:
+        """Row for one symbol as a Quote"""
+        row = self.index.get(symbol.upper())
+        if row is None:
+            return None
+        return Quote(symbol=self.symbols[row], as_of=self.as_of,
+                     **{name: self.value(name, row) for name in QUOTE_COLUMNS})
+
+    def sector_mask(self, sector: str) -> np.ndarray:
+        """Rows whose sector contains the given text (ignoring case and spaces, so Hydropower matches Hydro Power)"""
+        text = sector.replace(' ', '').lower()
+        wanted = [code for code, name in enumerate(self.sectors) if text in name.replace(' ', '').lower()]
+        return np.isin(self.sector_codes, wanted)
+
+    def top(self, metric: str, n: int, largest: bool = True, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Row numbers of the n largest (or smallest) values of a column, best first; NaNs never rank"""
+        values = self.columns[metric]
+        valid = ~np.isnan(values)
+        if mask is not None:
+            valid &= mask
+        rows = np.flatnonzero(valid)
+        if not len(rows) or n <= 0:
+            return rows[:0]
+        keys = -values[rows] if largest else values[rows]
+        if n < len(rows):
+            # Partial selection: only the top n are ever fully sorted
+            picked = np.argpartition(keys, n - 1)[:n]
+            rows, keys = rows[picked], keys[picked]
+        return rows[np.argsort(keys, kind='stable')]
+
+    def sector_totals(self, metric: str = 'turnover') -> Dict[str, float]:
+        """Sum of a column per sector"""
+        known = self.sector_codes >= 0
+        values = np.nan_to_num(self.columns[metric][known])
+        totals = np.bincount(self.sector_codes[known], weights=values, minlength=len(self.sectors))
+        return dict(zip(self.sectors, totals.tolist()))
+
+
+def _snapshot_from_sharehub(live) -> MarketSnapshot:
+    quotes, turnover, trades = [], [], []
+    for item in live['companies']:
+        quotes.append(Quote.from_sharehub(item, live['as_of']))
+        turnover.append(_to_float(item.get('totalTradeValue', item.get('turnover'))))
+        trades.append(_to_float(item.get('totalTrades', item.get('noOfTransactions'))))
+    return MarketSnapshot(live['as_of'], 'ShareHub', quotes, turnover, trades)
+
+
+def _snapshot_from_live_trading(live_trading) -> MarketSnapshot:
+    # ShareSansar's table has no turnover or trade count columns; those stay NaN
+    quotes = [Quote.from_live_row(row, live_trading['as_of']) for row in live_trading['rows'] if len(row) > 9]
+    return MarketSnapshot(live_trading['as_of'], 'ShareSansar', quotes)
+
+
+class MarketSnapshotStore:
+    """
+    Holds the current MarketSnapshot and rebuilds it at most once per feed refresh,
+    from the ShareHub feed fetch_stock_symbols already downloads (ShareSansar's
+    live table when ShareHub fails or any required column is empty). Readers always
+    get a complete, immutable snapshot.
+    """
+    def __init__(self, max_age: float = MARKET_SNAPSHOT_MAX_AGE):
+        self.max_age = max_age
+        self.snapshot: Optional[MarketSnapshot] = None
+        self.checked_at = 0.0
+        self.builds = 0
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    def get(self) -> MarketSnapshot:
+        """Current snapshot; raises RequestException only if no source has ever loaded"""
+        snapshot = self.snapshot
+        if snapshot is not None and time.monotonic() - self.checked_at < self.max_age:
+            return snapshot
+        with self._lock:
+            # Another thread may have rebuilt it while we waited
+            if self.snapshot is not None and time.monotonic() - self.checked_at < self.max_age:
+                return self.snapshot
+            try:
+                self._refresh()
+            except requests.exceptions.RequestException:
+                if self.snapshot is None:
+                    raise
+                print("Market snapshot: all sources failed, keeping the previous snapshot")
+            self.checked_at = time.monotonic()
+            return self.snapshot
+
+    def _refresh(self) -> None:
+        try:
+            if self._build('ShareHub', fetch_sharehub_live(), _snapshot_from_sharehub, MARKET_SNAPSHOT_REQUIRED_COLUMNS):
+                return
+            print(f"Market snapshot: ShareHub rows are missing one of {MARKET_SNAPSHOT_REQUIRED_COLUMNS}, using ShareSansar")
+        except requests.exceptions.RequestException as e:
+            print(f"Market snapshot: ShareHub unavailable ({e}), using ShareSansar")
+        # Last resort: prices alone beat no snapshot at all
+        if not self._build('ShareSansar', fetch_live_trading(), _snapshot_from_live_trading, ('ltp',)):
+            raise requests.exceptions.RequestException("no live prices from ShareHub or ShareSansar")
+
+    def _build(self, source: str, payload, build, required: Tuple[str, ...]) -> bool:
+        """Rebuild from a payload unless it is unchanged; False if a required column has no values"""
+        # Fingerprint the content itself: an unchanged feed (fresh cache hit or 304) keeps its arrays
+        digest = hashlib.sha1(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+        fingerprint = (source, digest, company_metadata.version)
+        if fingerprint == self._fingerprint and self.snapshot is not None:
+            return True
+        started = time.perf_counter()
+        with trace_span('build market snapshot'):
+            snapshot = build(payload)
+        if not len(snapshot) or any(np.isnan(snapshot.column(name)).all() for name in required):
+            return False
+        snapshot.built_in = time.perf_counter() - started
+        self.snapshot = snapshot
+        self._fingerprint = fingerprint
+        self.builds += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return {'rows': 0, 'builds': self.builds}
+        return {
+            'rows': len(snapshot),
+            'source': snapshot.source,
+            'as_of': snapshot.as_of,
+            'builds': self.builds,
+            'build_ms': snapshot.built_in * 1000,
+        }
+
+
+market_snapshot = MarketSnapshotStore()
+
+
+# ============================================
+# Quote Sources (hedged, latency-ranked)
+# ============================================
+
+QUOTE_SOURCE_WINDOW = 50       # Rolling samples kept per source
+QUOTE_HEDGE_MIN_DELAY = 0.5    # Never hedge earlier than this (seconds)
+QUOTE_DEFAULT_P95 = 3.0        # Assumed p95 until a source has enough samples
+
+# Threads for quote fetches; hedged requests need their own pool so they can overlap
+quote_executor = BoundedExecutor('quote', max_workers=6, max_queue=None)
+
+
+class QuoteSource:
+    """An upstream that returns a live quote, with rolling latency and error statistics"""
+    def __init__(self, name: str, fetch_func):
+        self.name = name
+        self.fetch_func = fetch_func
+        self.latencies = deque(maxlen=QUOTE_SOURCE_WINDOW)
+        self.outcomes = deque(maxlen=QUOTE_SOURCE_WINDOW)  # True = answered, False = error
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Record one request outcome"""
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(ok)
+
+    def p95(self) -> float:
+        """95th percentile latency over the rolling window"""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < 5:
+            return QUOTE_DEFAULT_P95
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def error_rate(self) -> float:
+        """Fraction of failed requests over the rolling window"""
+        with self._lock:
+            outcomes = list(self.outcomes)
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def health_score(self) -> float:
+        """Lower is healthier: p95 latency penalised by the error rate"""
+        return self.p95() * (1 + 4 * self.error_rate())
+
+    def fetch(self, symbol: str):
+        """Fetch a quote, recording latency and errors; returns None if the symbol isn't listed here"""
+        start = time.monotonic()
+        try:
+            with trace_span(f"quote {self.name}"):
+                quote = self.fetch_func(symbol)
+        except DeadlineExceeded:
+            # Cut off by the caller's budget (or a losing hedge), not a source failure
+            raise
+        except Exception:
+            self.record(time.monotonic() - start, False)
+            raise
+        self.record(time.monotonic() - start, True)
+        return quote
+
+
+def fetch_quote_nepsealpha(symbol):
+    """Live quote from the NepseAlpha JSON feed"""
+    import cloudscraper
+    scraper = cloudscraper.create_scraper()
+    response = upstream_get('https://nepsealpha.com/live/stocks', session=scraper, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    prices = data.get('stock_live', {}).get('prices', [])
+
+    for item in prices:
+        if item.get('symbol', '').upper() == symbol:
+            close_price = _to_float(item.get("close"))
+            percent_change = _to_float(item.get("percent_change")) or 0.0
+
+            # Calculate previous close and point change
+            # Formula: prev_close = close / (1 + percent_change/100)
+            # Point Change = close - prev_close
+            if close_price and percent_change:
+                prev_close = close_price / (1 + percent_change / 100)
+                pt_change = close_price - prev_close
+            else:
+                prev_close = close_price
+                pt_change = 0.0
+
+            return Quote(
+                symbol=item.get("symbol", symbol),
+                ltp=close_price,
+                pt_change=pt_change,
+                pct_change=percent_change,
+                open=_to_float(item.get("open")),
+                high=_to_float(item.get("high")),
+                low=_to_float(item.get("low")),
+                volume=_to_float(item.get("volume")),
+                prev_close=prev_close,
+                as_of=data.get('stock_live', {}).get('asOf', 'N/A'),
+            )
+    return None
+
+
+def fetch_quote_sharesansar(symbol):
+    """Live quote from the ShareSansar live-trading table"""
+    live_trading = fetch_live_trading()
+
+    for row_data in live_trading['rows']:
+        if len(row_data) > 9 and row_data[1] == symbol:
+            return Quote.from_live_row(row_data, live_trading['as_of'])
+    return None
+
+
+def fetch_quote_sharehub(symbol):
+    """Live quote from the ShareHub Nepal home-page feed"""
+    live = fetch_sharehub_live()
+
+    for item in live['companies']:
+        if str(item['symbol']).upper() == symbol:
+            return Quote.from_sharehub(item, live['as_of'])
+    return None
+
+
+quote_sources = [
+    QuoteSource("NepseAlpha", fetch_quote_nepsealpha),
+    QuoteSource("ShareSansar", fetch_quote_sharesansar),
+    QuoteSource("ShareHub", fetch_quote_sharehub),
+]
+
+
+def fetch_quote_hedged(symbol):
+    """
+    Fetch a live quote from the healthiest source first. If it hasn't answered
+    within its p95 latency (or fails / doesn't list the symbol), the next source
+    is started as well and whichever answers first wins.
+    Returns (source_name, quote, None), or (None, None, not_listed) where not_listed
+    is True only if some source actually answered that it doesn't list the symbol
+    (as opposed to every attempt failing, timing out or being shed).
+    """
+    remaining = sorted(quote_sources, key=lambda source: source.health_score())
+    in_flight = {}
+
+    def launch_next():
+        source = remaining.pop(0)
+        future = quote_executor.submit(contextvars.copy_context().run, source.fetch, symbol)
+        in_flight[future] = source
+        return future, source
+
+    future, last_source = launch_next()
+    pending = {future}
+    not_listed = False
+    deadline = current_deadline.get()
+    while pending:
+        timeout = max(QUOTE_HEDGE_MIN_DELAY, last_source.p95()) if remaining else None
+        if deadline is not None:
+            timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            source = in_flight[future]
+            try:
+                quote = future.result()
+            except Exception as e:
+                print(f"Error fetching quote from {source.name}: {e}")
+                continue
+            if quote is None:
+                not_listed = True
+            elif quote.ltp is not None:
+                for other in pending:
+                    other.cancel()
+                return source.name, quote, None
+
+        if deadline is not None and deadline.expired():
+            break
+        # Hedge on a slow source, or fall back after a miss/failure
+        if remaining:
+            future, last_source = launch_next()
+            pending.add(future)
+    return None, None, not_listed
+
+
+def get_stock_quote(stock_name) -> Optional[Quote]:
+    """Live quote for a symbol (company metadata is fetched separately)"""
+    # Try to get from cache first
+    upper_stonk = stock_name.strip().upper()
+    cached_data = market_cache.get(upper_stonk, 'stock_details')
+    if cached_data:
+        return cached_data
+    # Recently not found (or all sources failed) - don't hit the upstreams again
+    if market_cache.is_negative(upper_stonk, 'stock_details'):
+        return market_cache.get_stale(upper_stonk, 'stock_details')
+
+    source_name, quote, not_listed = fetch_quote_hedged(upper_stonk)
+    if quote is None:
+        if not_listed:
+            # Only a source answering "not listed" is remembered; timeouts, open breakers
+            # and 5xx are transient and must not block a valid symbol for the negative TTL
+            market_cache.set_negative(upper_stonk, 'stock_details')
+        # All sources failed or are shedding load - serve the last known quote if any
+        return market_cache.get_stale(upper_stonk, 'stock_details')
+
+    print(f"STONK: Using {source_name} for {upper_stonk}")
+    market_cache.set(upper_stonk, 'stock_details', quote)
+    return quote
+
+
+def report_startup_timings() -> None:
+    """Print how long each startup phase took"""
+    print("Startup profile:")
+    for phase, seconds in startup_timings.items():
+        print(f"  {phase:<16} {seconds * 1000:8.1f} ms")
+
+
+WARMUP_CONCURRENCY = 3
+WARMUP_TIMEOUT = 60  # Seconds; whatever hasn't loaded by then is fetched on first use
+
+
+def warm_up_steps():
+    """(name, blocking function) pairs loaded right after connecting"""
+    steps = [
+        ('symbols', fetch_stock_symbols),
+        ('live board', fetch_live_trading),
+        ('market snapshot', market_snapshot.get),
+        ('market summary', get_market_summary),
+        ('indices', get_nepse_indices),
+        ('public offerings', get_public_offerings),
+    ]
+    # Chart libraries are imported last so they don't hold the GIL while the scrapes parse
+    if os.getenv("NTB_CHART_WARMUP", "1").lower() not in ("0", "false", "no"):
+        steps.append(('chart libraries', load_chart_libs))
+    return steps
+
+
+async def warm_up():
+    """Fill the caches the first commands after a restart need, with bounded concurrency"""
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(WARMUP_CONCURRENCY)
+    failed = []
+
+    async def warm(name, func):
+        async with semaphore:
+            try:
+                await run_blocking(func)
+            except Exception as e:
+                failed.append(name)
+                print(f"Warm-up of {name} failed: {e}")
+
+    # Logos and company metadata are warmed by their crawlers, which start in on_ready
     try:
-        print(f"STONK: Using JSON hybrid method for {upper_stonk}")
-    except Exception:
+        await asyncio.wait_for(
+            asyncio.gather(*(warm(name, func) for name, func in warm_up_steps())), WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"Warm-up did not finish within {WARMUP_TIMEOUT}s")
+    startup_timings['cache_warmup'] = time.perf_counter() - started
+    print(f"Warm-up finished in {startup_timings['cache_warmup']:.1f}s" + (f" ({', '.join(failed)} failed)" if failed else ""))
+    if STARTUP_PROFILE:
+        report_startup_timings()
+
+
+async def setup_bot():
+    """Runs once before the gateway connects"""
+    await start_metrics_server()
+    # Heroku and most supervisors stop the worker with SIGTERM; close cleanly so the cache snapshot is written
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: create_background_task(client.close()))
+    except (NotImplementedError, RuntimeError):
         pass
-    market_cache.set(stock_name.upper(), 'stock_details', stock_details)
-    return stock_details
 
 
 @client.event
 async def on_ready():
+    # on_ready also fires after reconnects; only the first one ends startup
+    if 'gateway_connect' not in startup_timings:
+        now = time.perf_counter()
+        startup_timings['gateway_connect'] = now - STARTUP_RUN_T0
+        startup_timings['time_to_ready'] = now - STARTUP_T0
+        if STARTUP_PROFILE:
+            report_startup_timings()
+        create_background_task(warm_up())
+    
     # Only start the background task if it's not already running
+    alert_dispatcher.start()
+    if not renew_leader_lease.is_running():
+        await client.loop.run_in_executor(None, leader_lease.renew)
+        renew_leader_lease.start()
     if not check_stock_alerts.is_running():
         check_stock_alerts.start()
+    if not refresh_company_metadata.is_running():
+        refresh_company_metadata.start()
+    if not refresh_company_logos.is_running():
+        refresh_company_logos.start()
+    if not refresh_symbol_index.is_running():
+        refresh_symbol_index.start()
+    if not refresh_ticker_boards.is_running():
+        refresh_ticker_boards.start()
     print(f"Logged in as {client.user}")
     print("Our Bot is Ready to use")
     print("-----------------------")
 
 
-def get_market_summary():
+@client.event
+async def on_command_error(ctx, error):
+    """Reply to known operational errors; log everything else like the default handler"""
+    # After-invoke hooks don't run for every failure path, so release here too
+    admission.release(ctx)
+    tracer.finish(ctx)
+
+    original = error
+    while getattr(original, 'original', None) is not None:
+        original = original.original
+    if ctx.command is not None:
+        command_errors.inc(ctx.command.qualified_name, type(original).__name__)
+
+    if isinstance(original, AdmissionRejected):
+        await ctx.send(str(original), ephemeral=True)
+        return
+    if isinstance(original, UpstreamUnavailable):
+        await ctx.reply("⚠️ The data source is temporarily unavailable. Please try again in a moment.")
+        return
+    if isinstance(original, ExecutorSaturated):
+        await ctx.send("⏳ The bot is busy right now. Please try again in a moment.", ephemeral=True)
+        return
+    if isinstance(error, commands.CommandNotFound):
+        return
+
+    print(f"Ignoring exception in command {ctx.command}:")
+    traceback.print_exception(type(error), error, error.__traceback__)
+
+
+# ============================================
+# Admission Control (per-user/guild limits, weighted priority)
+# ============================================
+
+# Weight class per command; lower priority value is admitted first from the queue
+COMMAND_CLASSES = {
+    'stonk': 'standard',
+    'chart': 'heavy',
+}
+DEFAULT_COMMAND_CLASS = 'cheap'
+CLASS_PRIORITIES = {'cheap': 0, 'standard': 1, 'heavy': 2}
+CLASS_CONCURRENCY = {'cheap': 8, 'standard': 6, 'heavy': 2}
+# Admin/maintenance commands bypass admission so they keep working under load
+ADMISSION_EXEMPT = {'sync', 'cachestats', 'clearcache', 'upstreams', 'loadstats', 'alertstats', 'perfstats'}
+# Commands whose reply is ephemeral, so a defer while queued must be too
+ADMISSION_EPHEMERAL = {'tickerboard'}
+
+ADMISSION_MAX_CONCURRENT = 8        # Commands running at once across all guilds
+ADMISSION_MAX_QUEUE = 20            # Waiting commands before new ones are shed
+ADMISSION_QUEUE_TIMEOUT = 5.0       # Seconds a command may wait for a slot
+ADMISSION_USER_CONCURRENCY = 2      # Commands in flight per user
+ADMISSION_GUILD_CONCURRENCY = 4     # Commands in flight per guild
+ADMISSION_USER_RATE = (6, 30)       # Commands per window (seconds) per user
+ADMISSION_GUILD_RATE = (30, 30)     # Commands per window (seconds) per guild
+
+
+class AdmissionRejected(commands.CheckFailure):
+    """Raised by the admission hook when a command is shed instead of queued"""
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class AdmissionController:
+    """Per-user/guild concurrency and rate limits with a priority queue for global slots"""
+    def __init__(self):
+        self.active = 0
+        self.active_by_class: Dict[str, int] = {}
+        self.user_active: Dict[int, int] = {}
+        self.guild_active: Dict[int, int] = {}
+        self.user_history: Dict[int, deque] = {}
+        self.guild_history: Dict[int, deque] = {}
+        self.waiters = []               # heap of (priority, seq, future, command_class)
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.rejections: Dict[str, int] = {}
+
+    def _reject(self, reason: str, message: str):
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        raise AdmissionRejected(reason, message)
+
+    @staticmethod
+    def _rate_exceeded(history: Dict[int, deque], key: int, limit: int, window: float, now: float) -> bool:
+        timestamps = history.setdefault(key, deque())
+        while timestamps and now - timestamps[0] > window:
+            timestamps.popleft()
+        return len(timestamps) >= limit
+
+    def _record_rate(self, user_id: int, guild_id: Optional[int], now: float) -> None:
+        """Count an admitted command against the rate windows (shed attempts don't use up the budget)"""
+        self.user_history.setdefault(user_id, deque()).append(now)
+        if guild_id is not None:
+            self.guild_history.setdefault(guild_id, deque()).append(now)
+
+    def _can_run(self, command_class: str) -> bool:
+        return (self.active < ADMISSION_MAX_CONCURRENT and
+                self.active_by_class.get(command_class, 0) < CLASS_CONCURRENCY.get(command_class, ADMISSION_MAX_CONCURRENT))
+
+    def _start(self, command_class: str) -> None:
+        self.active += 1
+        self.active_by_class[command_class] = self.active_by_class.get(command_class, 0) + 1
+        self.admitted += 1
+
+    def _finish(self, command_class: str) -> None:
+        self.active -= 1
+        self.active_by_class[command_class] -= 1
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued commands in priority order, skipping classes at their limit"""
+        blocked = []
+        while self.waiters:
+            entry = heapq.heappop(self.waiters)
+            future, command_class = entry[2], entry[3]
+            if future.done():
+                continue
+            if self._can_run(command_class):
+                self._start(command_class)
+                future.set_result(True)
+            else:
+                blocked.append(entry)
+            if self.active >= ADMISSION_MAX_CONCURRENT:
+                break
+        for entry in blocked:
+            heapq.heappush(self.waiters, entry)
+
+    async def acquire(self, ctx) -> None:
+        """Admit a command or raise AdmissionRejected; the ticket is stored on the context"""
+        command_class = COMMAND_CLASSES.get(ctx.command.name, DEFAULT_COMMAND_CLASS)
+        user_id = ctx.author.id
+        guild_id = ctx.guild.id if ctx.guild else None
+        now = time.monotonic()
+
+        if self._rate_exceeded(self.user_history, user_id, *ADMISSION_USER_RATE, now):
+            self._reject('user_rate', "⏳ You're sending commands too quickly. Please wait a few seconds and retry.")
+        if guild_id is not None and self._rate_exceeded(self.guild_history, guild_id, *ADMISSION_GUILD_RATE, now):
+            self._reject('guild_rate', "⏳ This server is sending a lot of commands. Please retry shortly.")
+        if self.user_active.get(user_id, 0) >= ADMISSION_USER_CONCURRENCY:
+            self._reject('user_busy', "⏳ Your previous commands are still running. Please retry when they finish.")
+        if guild_id is not None and self.guild_active.get(guild_id, 0) >= ADMISSION_GUILD_CONCURRENCY:
+            self._reject('guild_busy', "⏳ Too many commands are running in this server. Please retry shortly.")
+
+        # Reserve the per-user/guild slots while queued so queued commands count too
+        self._reserve(user_id, guild_id, 1)
+        if self._can_run(command_class) and not self.waiters:
+            self._start(command_class)
+        else:
+            if len(self.waiters) >= ADMISSION_MAX_QUEUE:
+                self._reserve(user_id, guild_id, -1)
+                self._reject('overloaded', "⏳ The bot is busy right now. Please retry in a few seconds.")
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (CLASS_PRIORITIES.get(command_class, 1), next(self._seq), future, command_class))
+            # Slash commands must be acknowledged within 3s; queueing can take longer,
+            # so defer now (commands defer through defer_command, which skips a second defer)
+            if ctx.interaction is not None and not ctx.interaction.response.is_done():
+                try:
+                    await ctx.interaction.response.defer(ephemeral=ctx.command.name in ADMISSION_EPHEMERAL)
+                except discord.HTTPException:
+                    pass  # Already expired; the command will fail to reply either way
+            try:
+                await asyncio.wait_for(future, ADMISSION_QUEUE_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                # The slot may have been handed over just as the wait ended
+                admitted = future.done() and not future.cancelled()
+                if not (admitted and isinstance(e, asyncio.TimeoutError)):
+                    if admitted:
+                        self._finish(command_class)
+                    self._reserve(user_id, guild_id, -1)
+                    if isinstance(e, asyncio.CancelledError):
+                        self._dispatch()
+                        raise
+                    self._reject('queue_timeout', "⏳ The bot is busy right now. Please retry in a few seconds.")
+        self._record_rate(user_id, guild_id, now)
+        ctx.admission_ticket = (command_class, user_id, guild_id)
+
+    def _reserve(self, user_id: int, guild_id: Optional[int], delta: int) -> None:
+        for counts, key in ((self.user_active, user_id), (self.guild_active, guild_id)):
+            if key is None:
+                continue
+            counts[key] = counts.get(key, 0) + delta
+            if not counts[key]:
+                del counts[key]
+
+    def release(self, ctx) -> None:
+        """Release a command's slot; safe to call more than once"""
+        ticket = getattr(ctx, 'admission_ticket', None)
+        if ticket is None:
+            return
+        ctx.admission_ticket = None
+        command_class, user_id, guild_id = ticket
+        self._finish(command_class)
+        self._reserve(user_id, guild_id, -1)
+        self._dispatch()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'active_by_class': dict(self.active_by_class),
+            'queue_depth': sum(1 for entry in self.waiters if not entry[2].done()),
+            'admitted': self.admitted,
+            'rejections': dict(self.rejections),
+        }
+
+
+admission = AdmissionController()
+
+
+async def defer_command(ctx, ephemeral: bool = False) -> None:
+    """ctx.defer() that is safe after admission already acknowledged a queued slash command"""
+    if ctx.interaction is not None and ctx.interaction.response.is_done():
+        return
+    await ctx.defer(ephemeral=ephemeral)
+
+
+@client.before_invoke
+async def admit_command(ctx):
+    """Admission control in front of every command"""
+    ctx.invoke_started = time.perf_counter()
+    if ctx.command is None:
+        return
+    tracer.start(ctx)
+    if ctx.command.name in ADMISSION_EXEMPT:
+        return
+    with trace_span('admission'):
+        await admission.acquire(ctx)
+
+
+@client.after_invoke
+async def release_command(ctx):
+    admission.release(ctx)
+    tracer.finish(ctx)
+    started = getattr(ctx, 'invoke_started', None)
+    if started is not None and ctx.command is not None:
+        outcome = 'error' if ctx.command_failed else 'ok'
+        command_latency.observe(time.perf_counter() - started, ctx.command.qualified_name, outcome)
+
+
+# Market summary table label -> MarketSummary field
+MARKET_SUMMARY_FIELDS = {
+    "Total Turnovers (Rs.)": 'turnover',
+    "Total Traded Shares": 'traded_shares',
+    "Total Transaction": 'transactions',
+    "Total Scrips Traded": 'scrips_traded',
+    "Total Market Cap (Rs.)": 'market_cap',
+    "Floated Market Cap (Rs.)": 'floated_market_cap',
+}
+
+
+def get_market_summary() -> MarketSummary:
     # Try to get from cache first
     cached_data = market_cache.get('market_summary', 'market_summary')
     if cached_data:
         return cached_data
     
-    # Cache miss - scrape the data
-    response3 = requests.get(
-        "https://www.sharesansar.com/market-summary", timeout=10)
-    soup3 = BeautifulSoup(response3.text, "lxml")
-    summary_cont = soup3.find("div", id="market_symmary_data")
-    last_mktsum = ""
-    if summary_cont is not None:
-        msdate = summary_cont.find("h5").find("span")
-        if msdate is not None:
-            last_mktsum = msdate.text
-    data_sum = soup3.find_all("td")
-    market_summary = {
-        "As of": last_mktsum,
-        f"{data_sum[0].text}": f"{data_sum[1].text}",
-        f"{data_sum[2].text}": f"{data_sum[3].text}",
-        f"{data_sum[4].text}": f"{data_sum[5].text}",
-        f"{data_sum[6].text}": f"{data_sum[7].text}",
-        f"{data_sum[8].text}": f"{data_sum[9].text}",
-        f"{data_sum[10].text}": f"{data_sum[11].text}",
-    }
+    # Cache miss - scrape the data (serve stale if ShareSansar is shedding load)
+    try:
+        summary_page = fetch_market_summary_page()
+    except UpstreamUnavailable:
+        stale = market_cache.get_stale('market_summary', 'market_summary')
+        if stale is None:
+            raise
+        return stale
+    data_sum = summary_page['cells']
+    values = {field: None for field in MARKET_SUMMARY_FIELDS.values()}
+    unknown_labels = []
+    for label, value in zip(data_sum[0::2], data_sum[1::2]):
+        field = MARKET_SUMMARY_FIELDS.get(label.strip())
+        if field is not None:
+            values[field] = _to_float(value)
+        else:
+            unknown_labels.append(label.strip())
+    missing = [label for label, field in MARKET_SUMMARY_FIELDS.items() if values[field] is None]
+    if missing:
+        # ShareSansar renamed or reordered the table; say so instead of silently showing N/A
+        print(f"Market summary: no value for {missing}; unrecognised labels {unknown_labels}")
+    market_summary = MarketSummary(as_of=summary_page['as_of'], **values)
     # Store in cache before returning
     market_cache.set('market_summary', 'market_summary', market_summary)
     return market_summary
 
 
-@client.hybrid_command(name='mktsum', description='Get market summary')
-async def mktsum(ctx):
-    await ctx.defer()
-    market_summary = get_market_summary()
-
-    if not market_summary:
-        embed = discord.Embed(
-            title="❌ Data Unavailable",
-            description="No market summary data found.",
-            color=discord.Color.red()
-        )
-        await ctx.reply(embed=embed)
-        return
-
+def build_market_summary_embed(market_summary):
+    """Build the market summary embed (the footer is added per caller)"""
     # Create enhanced embed with better structure
     embed = discord.Embed(
         title="📊 NEPSE Market Summary",
@@ -1011,91 +3539,65 @@ async def mktsum(ctx):
         color=discord.Color.blue()
     )
 
-    # Parse and format values
-    try:
-        turnover = market_summary["Total Turnovers (Rs.)"]
-        shares = market_summary["Total Traded Shares "]
-        transactions = market_summary["Total Transaction "]
-        scrips = market_summary["Total Scrips Traded "]
-        market_cap = market_summary["Total Market Cap (Rs.)"]
-        float_cap = market_summary["Floated Market Cap (Rs.)"]
-        
-        # Trading Activity Section
-        embed.add_field(
-            name="💰 TRADING ACTIVITY",
-            value=(
-                f"**💵 Turnover:** {format_number(turnover)}\n"
-                f"**📊 Volume:** {format_number(shares)}\n"
-                f"**🔄 Transactions:** {transactions:,}\n"
-                f"**📈 Scrips Traded:** {scrips}"
-            ),
-            inline=False
-        )
-        
-        # Market Capitalization Section
-        embed.add_field(
-            name="━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━",
-            value="",
-            inline=False
-        )
-        
+    # Trading Activity Section
+    embed.add_field(
+        name="💰 TRADING ACTIVITY",
+        value=(
+            f"**💵 Turnover:** {format_number(market_summary.turnover)}\n"
+            f"**📊 Volume:** {format_number(market_summary.traded_shares)}\n"
+            f"**🔄 Transactions:** {_format_count(market_summary.transactions)}\n"
+            f"**📈 Scrips Traded:** {_format_count(market_summary.scrips_traded)}"
+        ),
+        inline=False
+    )
+    
+    # Market Capitalization Section
+    embed.add_field(
+        name="━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━",
+        value="",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="💎 MARKET CAPITALIZATION",
+        value=(
+            f"**🏦 Total Market Cap:** {format_number(market_summary.market_cap)}\n"
+            f"**🌊 Floated Market Cap:** {format_number(market_summary.floated_market_cap)}"
+        ),
+        inline=False
+    )
+    
+    # Float ratio when both caps were parsed
+    if market_summary.market_cap and market_summary.floated_market_cap is not None:
+        float_ratio = (market_summary.floated_market_cap / market_summary.market_cap) * 100
         embed.add_field(
-            name="💎 MARKET CAPITALIZATION",
-            value=(
-                f"**🏦 Total Market Cap:** {format_number(market_cap)}\n"
-                f"**🌊 Floated Market Cap:** {format_number(float_cap)}"
-            ),
+            name="📊 Float Ratio",
+            value=f"{float_ratio:.2f}%",
             inline=False
         )
-        
-        # Calculate float ratio if possible
-        try:
-            mc_val = float(market_cap.replace(',', ''))
-            fc_val = float(float_cap.replace(',', ''))
-            float_ratio = (fc_val / mc_val) * 100
-            embed.add_field(
-                name="📊 Float Ratio",
-                value=f"{float_ratio:.2f}%",
-                inline=False
-            )
-        except:
-            pass
-            
-    except:
-        # Fallback to simple display if parsing fails
-        embed.add_field(
-            name="Total Turnovers (Rs.)",
-            value=market_summary["Total Turnovers (Rs.)"],
-            inline=True,
-        )
-        embed.add_field(
-            name="Total Traded Shares",
-            value=market_summary["Total Traded Shares "],
-            inline=True,
-        )
-        embed.add_field(
-            name="Total Transactions",
-            value=market_summary["Total Transaction "],
-            inline=True,
-        )
-        embed.add_field(
-            name="Total Scrips Traded",
-            value=market_summary["Total Scrips Traded "],
-            inline=True,
-        )
-        embed.add_field(
-            name="Total Market Cap (Rs.)",
-            value=market_summary["Total Market Cap (Rs.)"],
-            inline=True,
-        )
-        embed.add_field(
-            name="Floated Market Cap (Rs.)",
-            value=market_summary["Floated Market Cap (Rs.)"],
-            inline=True,
+    return embed
+
+
+@client.hybrid_command(name='mktsum', description='Get market summary')
+async def mktsum(ctx):
+    await defer_command(ctx)
+    market_summary = await run_blocking(get_market_summary, executor=io_executor)
+
+    if not market_summary:
+        embed = discord.Embed(
+            title="❌ Data Unavailable",
+            description="No market summary data found.",
+            color=discord.Color.red()
         )
+        await ctx.reply(embed=embed)
+        return
+
+    # Reuse the rendered embed until the market summary snapshot changes
+    version = market_cache.get_version('market_summary', 'market_summary')
+    embed = embed_cache.get_or_build('mktsum', version, lambda: build_market_summary_embed(market_summary))
     
     embed.set_footer(
-        text=f"As of: {market_summary['As of']} • Data from ShareSansar",
+        text=f"As of: {market_summary.as_of} • Data from ShareSansar",
         icon_url=ctx.author.avatar.url if ctx.author.avatar else None
     )
 
@@ -1109,111 +3611,100 @@ async def stonk(ctx, *, stock_name: str):
     """
     this command retreives data for a specific stock
     """
-    await ctx.defer()
+    await defer_command(ctx)
     if stock_name.upper() == "NEPSE":
         await ctx.reply("📊 For details on NEPSE, use `!nepse` or use `!mktsum` to get the market summary. 📈")
         return
     
-    # Get event loop first
-    loop = ctx.bot.loop
+    # Reject unknown symbols locally before any upstream fetch
+    symbol, suggestions = resolve_symbol(stock_name)
+    if symbol is None:
+        await ctx.reply(embed=symbol_not_found_embed(stock_name, suggestions))
+        return
+    
+    # Price and company metadata are fetched concurrently and /stonk waits at most one time
+    # budget for both (the logo comes from the local index); whatever misses it is marked as loading.
+    # Only the quote fetch carries the deadline - a late price is useless - while the company
+    # metadata fetch keeps going in the background and lands in the persistent store for next time.
+    company_task = asyncio.ensure_future(run_blocking(get_company_details, symbol, executor=io_executor))
+    with request_deadline(STONK_DEADLINE) as deadline:
+        quote_task = asyncio.ensure_future(run_blocking(get_stock_quote, symbol, executor=io_executor))
+    await asyncio.wait({quote_task, company_task}, timeout=deadline.remaining())
+    for task in (quote_task, company_task):
+        if not task.done():
+            # Retrieve the outcome so a late failure isn't logged as never retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            create_background_task(task)
     
-    # Fetch stock details and company logo in parallel
-    stock_details = await loop.run_in_executor(None, get_stock_details, stock_name)
+    quote_details = quote_task.result() if quote_task.done() else None
+    company_details = company_task.result() if company_task.done() else None
     
     Embedcolor = discord.Color.default()
     ud_emoji = ""
     pt_prefix = ""
     
-    # Fetch company logo
-    company_url = f"https://sharehubnepal.com/company/{stock_name.strip().upper()}"
-    img_url = await loop.run_in_executor(None, fetch_and_extract_image, company_url)
-
-    # Check if stock details were found
-    if stock_details is None:
+    # Check if stock details were found (a miss after the deadline means "slow", not "unknown")
+    quote_timed_out = not quote_task.done() or deadline.expired()
+    if quote_details is None and quote_timed_out:
+        quote_details = market_cache.get_stale(symbol, 'stock_details')
+        if quote_details is None:
+            await ctx.reply(f"⏱️ Price data for **{symbol}** is taking too long to load. Please try again in a moment.")
+            return
+    if quote_details is None:
         await ctx.reply(f"⚠️ Stock '{stock_name.upper()}' not found. Please ensure the stock name is correct.")
         return
-
-    company_name = extract_stock_name(stock_details["Company fullform"])
-    try:
-        last_traded_price = round(
-            float(stock_details["Last Traded Price"].replace(",", "")), 2)
-        prev_closing = round(
-            float(stock_details["Prev.Closing"].replace(",", "")), 2)
-        open_price = round(float(stock_details["Open"].replace(",", "")), 2)
-        high_price = round(float(stock_details["High"].replace(",", "")), 2)
-        low_price = round(float(stock_details["Low"].replace(",", "")), 2)
-        volume = stock_details["Volume"].replace(",", "")
-        pt_change = float(stock_details["Pt Change"].replace(",", ""))
-        pct_change = stock_details["% Change"]
-
-        if last_traded_price > prev_closing:
-            ud_emoji = "📈"
-            pt_prefix = "+"
-            Embedcolor = discord.Color.green()
-        elif last_traded_price==prev_closing:
-            ud_emoji = "🟰"
-            Embedcolor = discord.Color.light_grey()
-        else:
-            ud_emoji = "📉"
-            Embedcolor = discord.Color.red()
-    except (KeyError, ValueError) as e:
-        await ctx.reply("Error processing stock data. Please ensure the stock name is correct.", e)
-        return
+    
+    partial = company_details is None or quote_timed_out
+    if company_details is None:
+        company_details = {"sector": "⏳ Loading", "share registrar": "⏳ Loading", "company fullform": symbol}
+    quote = quote_details
+
+    # Company logo from the local index
+    img_url = get_company_logo(stock_name)
+
+    company_name = extract_stock_name(company_details["company fullform"])
+    last_traded_price = round(quote.ltp, 2) if quote.ltp is not None else None
+    prev_closing = round(quote.prev_close, 2) if quote.prev_close is not None else None
+
+    if last_traded_price is None or prev_closing is None:
+        # A source without a previous close still renders; the missing fields show N/A
+        Embedcolor = discord.Color.light_grey()
+    elif last_traded_price > prev_closing:
+        ud_emoji = "📈"
+        pt_prefix = "+"
+        Embedcolor = discord.Color.green()
+    elif last_traded_price==prev_closing:
+        ud_emoji = "🟰"
+        Embedcolor = discord.Color.light_grey()
+    else:
+        ud_emoji = "📉"
+        Embedcolor = discord.Color.red()
 
     embed = discord.Embed(
         title=f"Details of {stock_name.upper()} (*Click for more info*)",
-        description=f"**Company**: {company_name}\n**Sector**: {stock_details['Sector']}\n**Share Registrar**: {stock_details['Share Registrar']}\n*[Click here to view technical chart](https://nepsealpha.com/trading/chart?symbol={stock_details['Symbol']})*",
+        description=f"**Company**: {company_name}\n**Sector**: {company_details['sector']}\n**Share Registrar**: {company_details['share registrar']}\n*[Click here to view technical chart](https://nepsealpha.com/trading/chart?symbol={quote.symbol})*",
         color=Embedcolor,
-        url=f"https://merolagani.com/CompanyDetail.aspx?symbol={stock_details['Symbol']}",
-    )
-    embed.add_field(
-        name=list(stock_details.keys())[0],
-        value=stock_details["Symbol"],
-        inline=True,
-    )
-    embed.add_field(
-        name=list(stock_details.keys())[1],
-        value=f"{stock_details['Last Traded Price']} {ud_emoji}",
-        inline=True,
-    )
-    embed.add_field(
-        name=list(stock_details.keys())[2],
-        value=f"{pt_prefix}{stock_details['Pt Change']}",
-        inline=True,
-    )
-    embed.add_field(
-        name=list(stock_details.keys())[
-            4], value=stock_details["Open"], inline=True
-    )
-    embed.add_field(
-        name=list(stock_details.keys())[
-            5], value=stock_details["High"], inline=True
-    )
-    embed.add_field(
-        name=list(stock_details.keys())[
-            6], value=stock_details["Low"], inline=True
-    )
-    embed.add_field(
-        name=list(stock_details.keys())[3],
-        value=stock_details["% Change"],
-        inline=True,
-    )
-    embed.add_field(
-        name=list(stock_details.keys())[7],
-        value=stock_details["Volume"],
-        inline=True,
-    )
-    embed.add_field(
-        name=list(stock_details.keys())[8],
-        value=stock_details["Prev.Closing"],
-        inline=True,
+        url=f"https://merolagani.com/CompanyDetail.aspx?symbol={quote.symbol}",
     )
+    # Numbers are formatted here, at render time; the cache holds the parsed Quote
+    embed.add_field(name="Symbol", value=quote.symbol, inline=True)
+    embed.add_field(name="Last Traded Price", value=f"{_format_price(quote.ltp)} {ud_emoji}", inline=True)
+    embed.add_field(name="Pt Change", value=f"{pt_prefix}{_format_price(quote.pt_change)}", inline=True)
+    embed.add_field(name="Open", value=_format_price(quote.open), inline=True)
+    embed.add_field(name="High", value=_format_price(quote.high), inline=True)
+    embed.add_field(name="Low", value=_format_price(quote.low), inline=True)
+    embed.add_field(name="% Change", value=_format_pct(quote.pct_change), inline=True)
+    embed.add_field(name="Volume", value=_format_count(quote.volume), inline=True)
+    embed.add_field(name="Prev.Closing", value=_format_price(quote.prev_close), inline=True)
     
     # Set company logo as thumbnail if available
     if img_url:
         embed.set_thumbnail(url=img_url)
     
-    embed.set_footer(text=f"Last updated: {stock_details['As of']}")
+    footer = f"Last updated: {quote.as_of}"
+    if partial:
+        footer += " • Some details were still loading, try again shortly"
+    embed.set_footer(text=footer)
 
     # Create view with enhanced action buttons
     view = StockActionButtons(stock_name.upper(), last_traded_price)
@@ -1231,7 +3722,7 @@ async def chart(ctx, symbol: str = None, days: int = 90):
 	Generate and send a candlestick chart
 	Usage: !chart PRIN 30 or /chart PRIN 30
 	"""
-	await ctx.defer()
+	await defer_command(ctx)
 	
 	# Validate symbol
 	if symbol is None:
@@ -1243,6 +3734,13 @@ async def chart(ctx, symbol: str = None, days: int = 90):
 		await ctx.reply(embed=embed)
 		return
 	
+	# Reject unknown symbols locally before generating anything
+	resolved, suggestions = resolve_symbol(symbol)
+	if resolved is None:
+		await ctx.reply(embed=symbol_not_found_embed(symbol, suggestions))
+		return
+	symbol = resolved
+	
 	# Validate days
 	if days < 1 or days > 365:
 		embed = discord.Embed(
@@ -1297,8 +3795,18 @@ async def chart(ctx, symbol: str = None, days: int = 90):
 		processing_msg = None
 	
 	# Generate chart in executor to avoid blocking
-	loop = ctx.bot.loop
-	filename, result = await loop.run_in_executor(None, generate_candlestick_chart, symbol.upper(), days)
+	try:
+		filename, result = await run_blocking(generate_candlestick_chart, symbol.upper(), days, executor=render_executor)
+	except ExecutorSaturated:
+		busy_text = "⏳ The bot is busy rendering other charts. Please try again in a moment."
+		if processing_msg:
+			try:
+				await processing_msg.edit(embed=discord.Embed(title="⏳ Chart Queue Full", description=busy_text, color=discord.Color.orange()))
+				return
+			except discord.HTTPException:
+				pass
+		await ctx.reply(busy_text)
+		return
 	
 	if filename is None:
 		# Error occurred
@@ -1319,7 +3827,7 @@ async def chart(ctx, symbol: str = None, days: int = 90):
 	# Chart generated successfully
 	try:
 		# Get latest price info from the data
-		payload = fetch_all_chart_data(symbol.upper(), 1)
+		payload = await run_blocking(fetch_all_chart_data, symbol.upper(), 1, executor=io_executor)
 		latest = payload['data']['content'][0] if payload['data']['content'] else {}
 		
 		current_price = latest.get('close', 'N/A')
@@ -1328,10 +3836,8 @@ async def chart(ctx, symbol: str = None, days: int = 90):
 		volume = latest.get('volume', 'N/A')
 		latest_date = latest.get('date', 'N/A')  # Extract date from the API data
 		
-		# Fetch company logo (same logic as in stonk command)
-		company_url = f"https://sharehubnepal.com/company/{symbol.strip().upper()}"
-		loop = ctx.bot.loop
-		img_url = await loop.run_in_executor(None, fetch_and_extract_image, company_url)
+		# Company logo from the local index (same as stonk command)
+		img_url = get_company_logo(symbol)
 		
 		# Format change color
 		if isinstance(change, (int, float)):
@@ -1411,7 +3917,7 @@ async def chart(ctx, symbol: str = None, days: int = 90):
 @client.hybrid_command(name='charthelp', description='Show help for the chart command')
 async def charthelp(ctx):
 	"""Show help for the chart command"""
-	await ctx.defer()
+	await defer_command(ctx)
 	embed = discord.Embed(
 		title="📊 Candlestick Chart Command Help",
 		description="Generate beautiful candlestick charts for Nepal stock market",
@@ -1459,7 +3965,7 @@ async def charthelp(ctx):
 
 @client.hybrid_command(name='helpntb', description='Get help and information about available commands.')
 async def helpntb(ctx):
-    await ctx.defer()
+    await defer_command(ctx)
 
     embed = discord.Embed(
         title="📚 NEPSE Bot Command Guide",
@@ -1557,10 +4063,11 @@ async def helpntb(ctx):
 
     # !topgl command
     embed.add_field(
-        name="8. !topgl or /topgl",
+        name="8. !topgl [metric] [n] or /topgl [metric] [n]",
         value=(
-            "**Description:** Displays the top 10 gainers and top 10 losers in the market.\n"
-            "**Usage:** Type `!topgl` or `/topgl`."
+            "**Description:** Displays the top gainers and losers, or the leaders by turnover, volume or number of trades.\n"
+            "**Usage:** Type `!topgl` or `/topgl`, optionally with a metric and N (e.g. `!topgl turnover 20`).\n"
+            "**Metrics:** change (default), turnover, volume, active. N is 1-50, default 10."
         ),
         inline=False
     )
@@ -1599,39 +4106,201 @@ async def helpntb(ctx):
         inline=False
     )
 
+    # !screen command
+    embed.add_field(
+        name="12. !screen <filters> or /screen <filters>",
+        value=(
+            "**Description:** Filters every listed stock and sorts the matches.\n"
+            "**Usage:** Type `!screen change>5 volume>100k sector=Hydropower` or add `sort=turnover` / `asc`.\n"
+            "**Fields:** change, ltp, open, high, low, volume, turnover, trades, sector."
+        ),
+        inline=False
+    )
+
     embed.set_footer(
         text="Both traditional commands (starting with !) and slash commands (starting with /) are supported. Use whichever you prefer!")
 
     await ctx.reply(embed=embed)
 
 
-def get_stock_price(stock_name):
-    response = requests.get(
-        "https://www.sharesansar.com/live-trading", timeout=10)
-    soup = BeautifulSoup(response.text, 'lxml')
-    df = soup.find('tbody')
-    stock_rows = df.find_all('tr')
-    for row in stock_rows:
-        row_data = row.find_all('td')  # All <td> in the current row
+def get_stock_prices(stock_names):
+    """LTPs for several symbols from one ShareSansar live-table fetch (None where unknown)"""
+    prices = {stock_name: None for stock_name in stock_names}
+    try:
+        live_trading = fetch_live_trading()
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching prices for {', '.join(prices)}: {e}")
+        return prices
+    wanted = {stock_name.upper(): stock_name for stock_name in stock_names}
+    for row_data in live_trading['rows']:
         # Use upper to match stock names
-        if row_data[1].text.strip().upper() == stock_name.upper():
-            return round(float(row_data[2].text.strip().replace(',', '')), 2)
-    return None
+        if len(row_data) > 2 and row_data[1].upper() in wanted:
+            prices[wanted[row_data[1].upper()]] = _to_float(row_data[2])
+    return {stock_name: round(price, 2) if price is not None else None for stock_name, price in prices.items()}
+
+
+def get_stock_price(stock_name):
+    return get_stock_prices([stock_name])[stock_name]
+
+
+# ============================================
+# Alert Delivery (DM queue with coalescing and backoff)
+# ============================================
+
+ALERT_DELIVERY_CONCURRENCY = 4   # DMs in flight at once
+ALERT_DELIVERY_MAX_ATTEMPTS = 3
+ALERT_BACKOFF_BASE = 2.0         # Seconds; doubled per retry when Discord rate-limits us
+ALERT_MAX_MESSAGE_LENGTH = 1900
+
+
+class AlertDispatcher:
+    """Queue alert DMs, coalesce them per user and deliver with bounded concurrency"""
+    def __init__(self, concurrency: int = ALERT_DELIVERY_CONCURRENCY):
+        self.concurrency = concurrency
+        self.queue: Optional[asyncio.Queue] = None
+        self.pending: Dict[int, List[Tuple[str, float]]] = {}   # user_id -> [(line, enqueued_at)]
+        self.dm_channels: Dict[int, discord.DMChannel] = {}
+        self.workers: List[asyncio.Task] = []
+        self.paused_until = 0.0
+        self.latencies = deque(maxlen=500)
+        self.stats = {'enqueued': 0, 'coalesced': 0, 'delivered': 0, 'messages': 0,
+                      'retries': 0, 'rate_limited': 0, 'failed': 0}
+
+    def start(self) -> None:
+        """Start the delivery workers on the running loop"""
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        self.workers = [task for task in self.workers if not task.done()]
+        while len(self.workers) < self.concurrency:
+            self.workers.append(asyncio.create_task(self._worker()))
+
+    def enqueue(self, user_id: int, line: str) -> None:
+        """Queue an alert line; lines for a user already waiting are merged into one message"""
+        self.stats['enqueued'] += 1
+        if user_id in self.pending:
+            self.pending[user_id].append((line, time.monotonic()))
+            self.stats['coalesced'] += 1
+            return
+        self.pending[user_id] = [(line, time.monotonic())]
+        self.queue.put_nowait(user_id)
+
+    async def _get_dm_channel(self, user_id: int) -> discord.DMChannel:
+        """DM channel from cache, falling back to the gateway cache and then REST"""
+        channel = self.dm_channels.get(user_id)
+        if channel is not None:
+            return channel
+        user = client.get_user(user_id) or await client.fetch_user(user_id)
+        channel = user.dm_channel or await user.create_dm()
+        self.dm_channels[user_id] = channel
+        return channel
+
+    @staticmethod
+    def _compose(lines: List[str]) -> str:
+        if len(lines) == 1:
+            return lines[0]
+        message = f"🔔 **{len(lines)} ALERTS!**\n" + "\n".join(f"• {line}" for line in lines)
+        if len(message) > ALERT_MAX_MESSAGE_LENGTH:
+            message = message[:ALERT_MAX_MESSAGE_LENGTH].rsplit("\n", 1)[0] + "\n…"
+        return message
+
+    async def _wait_if_paused(self) -> None:
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _worker(self) -> None:
+        while True:
+            user_id = await self.queue.get()
+            try:
+                await self._deliver(user_id)
+            except Exception as e:
+                print(f"Alert delivery worker error: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, user_id: int) -> None:
+        # Take the batch now; alerts arriving while we send start a new batch
+        batch = self.pending.pop(user_id, [])
+        if not batch:
+            return
+        message = self._compose([line for line, _ in batch])
+
+        for attempt in range(ALERT_DELIVERY_MAX_ATTEMPTS):
+            await self._wait_if_paused()
+            try:
+                channel = await self._get_dm_channel(user_id)
+                await channel.send(message)
+            except discord.Forbidden:
+                # DMs closed or bot blocked - retrying won't help
+                print(f"Alert delivery to {user_id} failed: DMs are closed")
+                break
+            except discord.NotFound:
+                self.dm_channels.pop(user_id, None)
+                print(f"Alert delivery to {user_id} failed: user not found")
+                break
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    # discord.py retries per-route limits itself; reaching here means a global limit
+                    self.stats['rate_limited'] += 1
+                    backoff = ALERT_BACKOFF_BASE * (2 ** attempt)
+                    self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+                elif e.status < 500:
+                    print(f"Alert delivery to {user_id} failed: {e}")
+                    break
+                self.stats['retries'] += 1
+                await asyncio.sleep(ALERT_BACKOFF_BASE * (2 ** attempt))
+                continue
+            else:
+                now = time.monotonic()
+                self.latencies.extend(now - enqueued_at for _, enqueued_at in batch)
+                self.stats['delivered'] += len(batch)
+                self.stats['messages'] += 1
+                return
+
+        self.stats['failed'] += len(batch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Delivery counters plus latency percentiles in seconds"""
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            **self.stats,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'dm_channels': len(self.dm_channels),
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'paused_for': max(0.0, self.paused_until - time.monotonic()),
+        }
+
+
+alert_dispatcher = AlertDispatcher()
 
 
 @tasks.loop(seconds=30)
 async def check_stock_alerts():
+    started = time.perf_counter()
+    # Look each stock up once per scan, however many users watch it, off the event loop
+    watched = {stock_name for alerts in user_alerts.values() for stock_name in alerts}
+    if not watched:
+        return
+    # Pollers use the loop's default executor so command traffic on io_executor can't starve them
+    prices = await run_blocking(get_stock_prices, watched)
     for user_id, alerts in user_alerts.items():
         # Collect stocks to remove after checking prices
         stocks_to_remove = []
         for stock_name, target_prices in alerts.items():
-            current_price = get_stock_price(stock_name)
+            current_price = prices.get(stock_name)
             if current_price is not None:
                 # Iterate over a copy of target_prices
                 for target_price in target_prices[:]:
                     if current_price >= target_price:  # Check for exact price match
-                        user = await client.fetch_user(user_id)
-                        await user.send(f"🔔 **ALERT!** {stock_name} has reached your target price of Rs. {target_price}. Current price: Rs. {current_price}.")
+                        # Delivery happens on the alert queue so the scan never waits on Discord
+                        alert_dispatcher.enqueue(user_id, f"🔔 **ALERT!** {stock_name} has reached your target price of Rs. {target_price}. Current price: Rs. {current_price}.")
                         # Remove the alerted price
                         target_prices.remove(target_price)
 
@@ -1642,20 +4311,7 @@ async def check_stock_alerts():
         # Remove stocks after the iteration is done
         for stock_name in stocks_to_remove:
             del alerts[stock_name]
-
-
-def check_stock_exists(stock_name):
-    response = requests.get(
-        "https://www.sharesansar.com/live-trading", timeout=10)
-    soup = BeautifulSoup(response.text, 'lxml')
-    df = soup.find('tbody')
-    stock_rows = df.find_all('tr')  # List of all stock rows
-    for row in stock_rows:
-        row_data = row.find_all('td')  # All <td> in the current row
-        for td in row_data:
-            if td.text.strip() == stock_name.upper():
-                return True
-    return None
+    alert_loop_duration.observe(time.perf_counter() - started)
 
 
 @client.hybrid_command(name='setalert', description='set alert for stocks')
@@ -1665,21 +4321,17 @@ def check_stock_exists(stock_name):
 )
 @app_commands.autocomplete(stock_name=stock_autocomplete)
 async def setalert(ctx, stock_name: str, target_price: float):
-    await ctx.defer()
+    await defer_command(ctx)
     user_id = ctx.author.id
-    stock_name = stock_name.upper()
     
-    if check_stock_exists(stock_name) is None:
-        embed = discord.Embed(
-            title="❌ Stock Not Found",
-            description=f"Stock **{stock_name}** doesn't exist or there may be a typo.",
-            color=discord.Color.red()
-        )
-        await ctx.reply(embed=embed)
+    resolved, suggestions = resolve_symbol(stock_name)
+    if resolved is None:
+        await ctx.reply(embed=symbol_not_found_embed(stock_name, suggestions))
         return
+    stock_name = resolved
     
     # Get current price for comparison
-    current_price = get_stock_price(stock_name)
+    current_price = await run_blocking(get_stock_price, stock_name, executor=io_executor)
     
     if user_id not in user_alerts:
         user_alerts[user_id] = {}
@@ -1729,7 +4381,7 @@ async def setalert(ctx, stock_name: str, target_price: float):
 
 @client.hybrid_command(name='showalerts', description='displays your stock alerts')
 async def showalerts(ctx):
-    await ctx.defer()
+    await defer_command(ctx)
     user_id = ctx.author.id
     
     if user_id not in user_alerts or not user_alerts[user_id]:
@@ -1748,8 +4400,9 @@ async def showalerts(ctx):
     )
     
     alert_count = 0
+    current_prices = await run_blocking(get_stock_prices, list(user_alerts[user_id]), executor=io_executor)
     for stock, prices in user_alerts[user_id].items():
-        current_price = get_stock_price(stock)
+        current_price = current_prices.get(stock)
         
         for target in prices:
             alert_count += 1
@@ -1802,7 +4455,7 @@ async def showalerts(ctx):
 @app_commands.describe(stock_name='Stock symbol to remove alerts for')
 @app_commands.autocomplete(stock_name=stock_autocomplete)
 async def removealert(ctx, stock_name: str):
-    await ctx.defer()
+    await defer_command(ctx)
     user_id = ctx.author.id
     stock_name = stock_name.upper()
     
@@ -1837,9 +4490,15 @@ def scrape_top_gainers_losers():
     if cached_data:
         return cached_data
     
-    # Cache miss - scrape the data
-    response5 = requests.get(
-        "https://merolagani.com/LatestMarket.aspx", timeout=10)
+    # Cache miss - scrape the data (serve stale if merolagani is shedding load)
+    try:
+        response5 = upstream_get(
+            "https://merolagani.com/LatestMarket.aspx", timeout=10)
+    except UpstreamUnavailable:
+        stale = market_cache.get_stale('top_gl', 'top_gainers_losers')
+        if stale is None:
+            raise
+        return stale
     soup5 = BeautifulSoup(response5.text, 'html.parser')
 
     # Extracting gainers and losers data
@@ -1860,30 +4519,12 @@ def scrape_top_gainers_losers():
     # Top losers
     for tr in losers_row[1:]:
         tds = tr.find_all('td')
-        losers_data.append({
-            "symbol": tds[0].text,
-            "ltp": tds[1].text,
-            "%chg": tds[2].text,
-            "high": tds[3].text,
-            "low": tds[4].text,
-            "open": tds[5].text,
-            "qty": tds[6].text,
-            "turnover": tds[7].text
-        })
+        losers_data.append(TopMover(tds[0].text.strip(), *(_to_float(td.text) for td in tds[1:8])))
 
     # Top gainers
     for tr in gainers_row[1:]:
         tds = tr.find_all('td')
-        gainers_data.append({
-            "symbol": tds[0].text,
-            "ltp": tds[1].text,
-            "%chg": tds[2].text,
-            "high": tds[3].text,
-            "low": tds[4].text,
-            "open": tds[5].text,
-            "qty": tds[6].text,
-            "turnover": tds[7].text
-        })
+        gainers_data.append(TopMover(tds[0].text.strip(), *(_to_float(td.text) for td in tds[1:8])))
 
     # Store in cache before returning
     result = (gainers_data, losers_data)
@@ -1891,6 +4532,69 @@ def scrape_top_gainers_losers():
     return result
 
 
+TOPGL_PAGE_SIZE = 10
+TOPGL_MAX_N = 50
+# metric -> (snapshot column, list title, emoji); 'change' also ranks losers from the bottom
+TOPGL_METRICS = {
+    'change': ('pct_change', 'GAINERS', '📈'),
+    'turnover': ('turnover', 'BY TURNOVER', '💰'),
+    'volume': ('volume', 'BY VOLUME', '📊'),
+    'active': ('trades', 'MOST ACTIVE', '🔥'),
+}
+TOPGL_METRIC_ALIASES = {'gainers': 'change', 'losers': 'change', 'pct': 'change', 'vol': 'volume', 'trades': 'active'}
+
+
+def _movers_from_rows(snapshot: MarketSnapshot, rows: np.ndarray) -> List[TopMover]:
+    return [
+        TopMover(str(snapshot.symbols[row]), *(snapshot.value(name, row) for name in
+                 ('ltp', 'pct_change', 'high', 'low', 'open', 'volume', 'turnover', 'trades')))
+        for row in rows
+    ]
+
+
+def rank_top_movers(snapshot: MarketSnapshot, metric: str, n: int) -> Tuple[List[TopMover], List[TopMover]]:
+    """Top n by a metric from the snapshot (partial selection, not a full sort); losers only for 'change'"""
+    column = TOPGL_METRICS[metric][0]
+    if metric != 'change':
+        return _movers_from_rows(snapshot, snapshot.top(column, n)), []
+    change = snapshot.column(column)
+    with np.errstate(invalid='ignore'):
+        gainers = snapshot.top(column, n, largest=True, mask=change > 0)
+        losers = snapshot.top(column, n, largest=False, mask=change < 0)
+    return _movers_from_rows(snapshot, gainers), _movers_from_rows(snapshot, losers)
+
+
+def get_top_movers(metric: str = 'change', n: int = 10):
+    """
+    (ranked, losers, as_of, version, unavailable_from) computed locally from the market snapshot.
+    unavailable_from names the snapshot source when it doesn't carry the metric at all
+    (ShareSansar has no turnover or trade counts), otherwise it is None.
+    Percent-change rankings fall back to the merolagani top-10 scrape when the
+    snapshot is unavailable or has nothing to rank (e.g. before the market opens).
+    """
+    try:
+        snapshot = market_snapshot.get()
+    except requests.exceptions.RequestException:
+        snapshot = None
+    if snapshot is not None:
+        version = ('snapshot', market_snapshot.builds)
+        if np.isnan(snapshot.column(TOPGL_METRICS[metric][0])).all():
+            if metric != 'change':
+                return [], [], snapshot.as_of, version, snapshot.source
+        else:
+            with trace_span(f"rank {metric}"):
+                ranked, losers = rank_top_movers(snapshot, metric, n)
+            if ranked or losers or metric != 'change':
+                return ranked, losers, snapshot.as_of, version, None
+    if metric != 'change':
+        # merolagani only publishes percent-change rankings
+        return [], [], get_latest_time(), None, None
+
+    gainers, losers = scrape_top_gainers_losers()
+    return (gainers[:n], losers[:n], get_latest_time(),
+            ('merolagani', market_cache.get_version('top_gl', 'top_gainers_losers')), None)
+
+
 # ============================================
 # Top Gainers/Losers Pagination View
 # ============================================
@@ -1911,14 +4615,28 @@ class IPOApplyButton(discord.ui.View):
 
 
 class TopGLPagination(discord.ui.View):
-    """Pagination view for top gainers and losers"""
-    def __init__(self, gainers_data, losers_data, timestamp):
+    """Pagination view for top gainers/losers and the other top-N rankings"""
+    def __init__(self, gainers_data, losers_data, timestamp, version=None, metric='change', n=10, unavailable_from=None):
         super().__init__(timeout=300)
-        self.gainers_data = gainers_data
-        self.losers_data = losers_data
+        self.gainers_data = gainers_data   # The ranked list (gainers for 'change')
+        self.losers_data = losers_data     # Only used for 'change'
         self.timestamp = timestamp
+        self.version = version  # Data snapshot version used to reuse rendered pages
+        self.metric = metric
+        self.n = n
+        self.unavailable_from = unavailable_from  # Source that doesn't publish this metric, if any
         self.current_page = 0
-        self.max_page = 1  # 0 = Combined view, 1 = Full Gainers, 2 = Full Losers
+        self.pages = self.build_pages()
+
+    def build_pages(self):
+        """Page specs: the combined view (percent change only), then each list in chunks of TOPGL_PAGE_SIZE"""
+        pages = [('combined', 0)] if self.metric == 'change' else []
+        for kind, data in (('gainers', self.gainers_data), ('losers', self.losers_data)):
+            pages += [(kind, start) for start in range(0, len(data), TOPGL_PAGE_SIZE)]
+        return pages or [('gainers', 0)]
+
+    def page_footer(self, label):
+        return f"As of: {self.timestamp} • Page {self.current_page + 1}/{len(self.pages)} - {label}"
     
     def create_combined_embed(self):
         """Create combined view showing top 5 gainers and losers"""
@@ -1933,9 +4651,9 @@ class TopGLPagination(discord.ui.View):
         for index, stock in enumerate(self.gainers_data[:5]):
             medal = ["🥇", "🥈", "🥉", "  ", "  "][index]
             gainers_text += (
-                f"{medal} **#{index+1} {stock['symbol']}** {stock['%chg']}% 📈\n"
-                f"   Rs. {stock['ltp']} | Vol: {format_number(stock['qty'])}\n"
-                f"   Range: {stock['low']} → {stock['high']}\n\n"
+                f"{medal} **#{index+1} {stock.symbol}** {_format_pct(stock.pct_change)} 📈\n"
+                f"   Rs. {_format_price(stock.ltp)} | Vol: {format_number(stock.volume)}\n"
+                f"   Range: {_format_price(stock.low)} → {_format_price(stock.high)}\n\n"
             )
         
         embed.add_field(
@@ -1954,9 +4672,9 @@ class TopGLPagination(discord.ui.View):
         losers_text = ""
         for index, stock in enumerate(self.losers_data[:5]):
             losers_text += (
-                f"  **#{index+1} {stock['symbol']}** {stock['%chg']}% 📉\n"
-                f"   Rs. {stock['ltp']} | Vol: {format_number(stock['qty'])}\n"
-                f"   Range: {stock['low']} → {stock['high']}\n\n"
+                f"  **#{index+1} {stock.symbol}** {_format_pct(stock.pct_change)} 📉\n"
+                f"   Rs. {_format_price(stock.ltp)} | Vol: {format_number(stock.volume)}\n"
+                f"   Range: {_format_price(stock.low)} → {_format_price(stock.high)}\n\n"
             )
         
         embed.add_field(
@@ -1965,67 +4683,62 @@ class TopGLPagination(discord.ui.View):
             inline=False
         )
         
-        embed.set_footer(text=f"As of: {self.timestamp} • Page 1/3 - Combined View")
+        embed.set_footer(text=self.page_footer("Combined View"))
         return embed
     
-    def create_full_gainers_embed(self):
-        """Create full top 10 gainers view"""
+    def create_list_embed(self, kind, start):
+        """Create one page of a full ranked list"""
+        if kind == 'losers':
+            title, emoji, color = "LOSERS", "📉", discord.Color.red()
+            data = self.losers_data
+        else:
+            _, title, emoji = TOPGL_METRICS[self.metric]
+            color = discord.Color.green() if self.metric == 'change' else discord.Color.blue()
+            data = self.gainers_data
         embed = discord.Embed(
-            title="📈 TOP 10 GAINERS",
+            title=f"{emoji} TOP {len(data)} {title}" if data else f"{emoji} TOP {title}",
             description="━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━",
-            color=discord.Color.green()
+            color=color
         )
         
-        for index, stock in enumerate(self.gainers_data[:10]):
-            medal = ["🥇", "🥈", "🥉"] + ["  "] * 7
-            embed.add_field(
-                name=f"{medal[index]} #{index+1} {stock['symbol']}",
-                value=(
-                    f"**Price:** Rs. {stock['ltp']} | **Change:** {stock['%chg']}% 📈\n"
-                    f"**Range:** {stock['low']} → {stock['high']} | **Open:** {stock['open']}\n"
-                    f"**Volume:** {format_number(stock['qty'])} | **Turnover:** {format_number(stock['turnover'])}"
-                ),
-                inline=False
+        for index, stock in enumerate(data[start:start + TOPGL_PAGE_SIZE], start):
+            medal = ["🥇", "🥈", "🥉"][index] + " " if index < 3 and kind != 'losers' else ""
+            details = (
+                f"**Price:** Rs. {_format_price(stock.ltp)} | **Change:** {_format_pct(stock.pct_change)} "
+                f"{'📈' if (stock.pct_change or 0) >= 0 else '📉'}\n"
+                f"**Range:** {_format_price(stock.low)} → {_format_price(stock.high)} | **Open:** {_format_price(stock.open)}\n"
+                f"**Volume:** {format_number(stock.volume)} | **Turnover:** {format_number(stock.turnover)}"
             )
-        
-        embed.set_footer(text=f"As of: {self.timestamp} • Page 2/3 - Full Gainers List")
-        return embed
-    
-    def create_full_losers_embed(self):
-        """Create full top 10 losers view"""
-        embed = discord.Embed(
-            title="📉 TOP 10 LOSERS",
-            description="━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━",
-            color=discord.Color.red()
-        )
-        
-        for index, stock in enumerate(self.losers_data[:10]):
+            if stock.trades is not None:
+                details += f" | **Trades:** {_format_count(stock.trades)}"
+            embed.add_field(name=f"{medal}#{index+1} {stock.symbol}", value=details, inline=False)
+        if not data and self.unavailable_from:
             embed.add_field(
-                name=f"#{index+1} {stock['symbol']}",
-                value=(
-                    f"**Price:** Rs. {stock['ltp']} | **Change:** {stock['%chg']}% 📉\n"
-                    f"**Range:** {stock['low']} → {stock['high']} | **Open:** {stock['open']}\n"
-                    f"**Volume:** {format_number(stock['qty'])} | **Turnover:** {format_number(stock['turnover'])}"
-                ),
+                name="No data available",
+                value=f"{self.metric.title()} isn't available from the current data source ({self.unavailable_from}).",
                 inline=False
             )
+        elif not data:
+            embed.add_field(name="No data available", value="Nothing has traded on this metric yet.", inline=False)
         
-        embed.set_footer(text=f"As of: {self.timestamp} • Page 3/3 - Full Losers List")
+        label = f"Full {title.title()} List" if self.metric == 'change' else f"Ranked {title.title()}"
+        embed.set_footer(text=self.page_footer(label))
         return embed
     
     def get_current_embed(self):
-        """Get the current page embed"""
-        if self.current_page == 0:
-            return self.create_combined_embed()
-        elif self.current_page == 1:
-            return self.create_full_gainers_embed()
+        """Get the current page embed (reused across views built from the same snapshot)"""
+        kind, start = self.pages[self.current_page]
+        if kind == 'combined':
+            builder = self.create_combined_embed
         else:
-            return self.create_full_losers_embed()
+            builder = functools.partial(self.create_list_embed, kind, start)
+        version = (self.version, self.timestamp, len(self.pages)) if self.version is not None else None
+        return embed_cache.get_or_build(f"topgl:{self.metric}:{self.n}:{self.current_page}", version, builder)
     
     @discord.ui.button(label="◀️ Previous", style=discord.ButtonStyle.secondary)
     async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Go to previous page"""
-        self.current_page = (self.current_page - 1) % 3
+        self.current_page = (self.current_page - 1) % len(self.pages)
         await interaction.response.edit_message(embed=self.get_current_embed(), view=self)
     
     @discord.ui.button(label="📊 Combined", style=discord.ButtonStyle.primary)
@@ -2037,7 +4750,7 @@ class TopGLPagination(discord.ui.View):
     @discord.ui.button(label="Next ▶️", style=discord.ButtonStyle.secondary)
     async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Go to next page"""
-        self.current_page = (self.current_page + 1) % 3
+        self.current_page = (self.current_page + 1) % len(self.pages)
         await interaction.response.edit_message(embed=self.get_current_embed(), view=self)
     
     @discord.ui.button(label="🔄 Refresh", style=discord.ButtonStyle.success)
@@ -2045,10 +4758,19 @@ class TopGLPagination(discord.ui.View):
         """Refresh the data"""
         await interaction.response.defer()
         market_cache.clear('top_gainers_losers')
-        gainers, losers = scrape_top_gainers_losers()
+        try:
+            gainers, losers, timestamp, version, unavailable_from = await run_blocking(
+                get_top_movers, self.metric, self.n, executor=io_executor)
+        except ExecutorSaturated:
+            await interaction.followup.send("⏳ The bot is busy right now. Please try again in a moment.", ephemeral=True)
+            return
         self.gainers_data = gainers
         self.losers_data = losers
-        self.timestamp = get_latest_time()
+        self.timestamp = timestamp
+        self.version = version
+        self.unavailable_from = unavailable_from
+        self.pages = self.build_pages()
+        self.current_page = min(self.current_page, len(self.pages) - 1)
         await interaction.followup.edit_message(
             message_id=interaction.message.id,
             embed=self.get_current_embed(),
@@ -2059,37 +4781,403 @@ class TopGLPagination(discord.ui.View):
 # Command to display top gainers and losers
 
 
-@client.hybrid_command(name='topgl', description='top 10 gainers and losers')
-async def topgl(ctx):
-    await ctx.defer()
+@client.hybrid_command(name='topgl', description='Top N gainers/losers, or leaders by turnover, volume or trades')
+@app_commands.describe(
+    metric='change (gainers/losers), turnover, volume or active (most trades)',
+    n='How many stocks to rank (1-50, default: 10)'
+)
+async def topgl(ctx, metric: str = 'change', n: int = 10):
+    await defer_command(ctx)
+
+    metric = metric.lower()
+    if metric.isdigit():
+        # `!topgl 20` means the top 20 gainers/losers
+        metric, n = 'change', int(metric)
+    metric = TOPGL_METRIC_ALIASES.get(metric, metric)
+    if metric not in TOPGL_METRICS or not 1 <= n <= TOPGL_MAX_N:
+        embed = discord.Embed(
+            title="❌ Invalid Ranking",
+            description=(
+                f"**Metric:** one of {', '.join(f'`{name}`' for name in TOPGL_METRICS)}\n"
+                f"**N:** between 1 and {TOPGL_MAX_N}\n\n**Example:** `/topgl turnover 20`"
+            ),
+            color=discord.Color.red()
+        )
+        await ctx.reply(embed=embed)
+        return
 
-    gainers_data, losers_data = scrape_top_gainers_losers()
-    timestamp = get_latest_time()
+    # Ranked locally from the cached market snapshot; merolagani is only the fallback
+    gainers_data, losers_data, timestamp, version, unavailable_from = await run_blocking(
+        get_top_movers, metric, n, executor=io_executor)
     
     # Create pagination view
-    view = TopGLPagination(gainers_data, losers_data, timestamp)
+    view = TopGLPagination(gainers_data, losers_data, timestamp, version, metric, n, unavailable_from)
     
     # Send the combined view first
     await ctx.reply(embed=view.get_current_embed(), view=view)
 
 
+# ============================================
+# Market Screener (vectorized filters over the market snapshot)
+# ============================================
+
+SCREEN_PAGE_SIZE = 10
+# Filter/sort names users can type -> snapshot column
+SCREEN_FIELDS = {
+    'change': 'pct_change', 'pct': 'pct_change', '%': 'pct_change',
+    'ptchange': 'pt_change', 'points': 'pt_change',
+    'ltp': 'ltp', 'price': 'ltp',
+    'open': 'open', 'high': 'high', 'low': 'low', 'prevclose': 'prev_close',
+    'volume': 'volume', 'vol': 'volume',
+    'turnover': 'turnover', 'trades': 'trades',
+}
+SCREEN_SUFFIXES = {'k': 1e3, 'l': 1e5, 'm': 1e6, 'cr': 1e7, 'b': 1e9}
+SCREEN_OPERATORS = {
+    '>=': np.greater_equal, '<=': np.less_equal, '!=': np.not_equal,
+    '>': np.greater, '<': np.less, '=': np.equal,
+}
+SCREEN_TERM = regex.compile(r'^([a-z%_]+)(>=|<=|!=|>|<|=)(.+)$')
+
+
+class ScreenError(ValueError):
+    """A screen expression that can't be parsed; the message is shown to the user"""
+
+
+class Screen:
+    """A parsed screen: numeric filters, sector filters and the sort order"""
+    __slots__ = ('filters', 'sectors', 'sort_by', 'descending')
+
+    def __init__(self):
+        self.filters: List[Tuple[str, str, float]] = []   # (column, operator, value)
+        self.sectors: List[Tuple[str, bool]] = []         # (text, wanted)
+        self.sort_by = 'pct_change'
+        self.descending = True
+
+    def describe(self) -> str:
+        names = {column: name for name, column in reversed(list(SCREEN_FIELDS.items()))}
+        terms = [f"{names[column]}{op}{format_number(value) if abs(value) >= 1000 else f'{value:g}'}"
+                 for column, op, value in self.filters]
+        terms += [f"sector{'=' if wanted else '!='}{text}" for text, wanted in self.sectors]
+        order = 'desc' if self.descending else 'asc'
+        return f"{' '.join(terms) or 'whole market'} • sorted by {names[self.sort_by]} {order}"
+
+
+def _parse_screen_value(text: str) -> float:
+    text = text.strip().lower().replace(',', '').rstrip('%')
+    for suffix, multiplier in SCREEN_SUFFIXES.items():
+        if text.endswith(suffix):
+            number = text[:-len(suffix)]
+            break
+    else:
+        number, multiplier = text, 1
+    try:
+        return float(number) * multiplier
+    except ValueError:
+        raise ScreenError(f"`{text}` is not a number (use e.g. 5, 2.5, 100k, 1.5m, 2cr)") from None
+
+
+def parse_screen(expression: str) -> Screen:
+    """Parse e.g. 'change>5 volume>100k sector=Hydropower sort=turnover asc'"""
+    screen = Screen()
+    for token in expression.split():
+        lowered = token.lower()
+        if lowered in ('asc', 'desc'):
+            screen.descending = lowered == 'desc'
+            continue
+        match = SCREEN_TERM.match(lowered)
+        if match is None:
+            raise ScreenError(f"Can't read `{token}`; filters look like `change>5` or `sector=Hydropower`")
+        name, op, value = match.groups()
+        if name == 'sort':
+            if value not in SCREEN_FIELDS:
+                raise ScreenError(f"Can't sort by `{value}`; try one of: {', '.join(sorted(SCREEN_FIELDS))}")
+            screen.sort_by = SCREEN_FIELDS[value]
+        elif name == 'sector':
+            if op not in ('=', '!='):
+                raise ScreenError("Sectors can only be matched with `=` or `!=`")
+            # Keep the user's spelling for display; underscores stand in for spaces
+            screen.sectors.append((token.split(op, 1)[1].replace('_', ' '), op == '='))
+        elif name in SCREEN_FIELDS:
+            screen.filters.append((SCREEN_FIELDS[name], op, _parse_screen_value(value)))
+        else:
+            raise ScreenError(f"Unknown field `{name}`; try one of: sector, {', '.join(sorted(SCREEN_FIELDS))}")
+    return screen
+
+
+def run_screen(snapshot: MarketSnapshot, screen: Screen) -> np.ndarray:
+    """Row numbers matching every filter, ordered by the sort column (missing values last)"""
+    mask = np.ones(len(snapshot), dtype=bool)
+    for column, op, value in screen.filters:
+        values = snapshot.column(column)
+        # Rows without the value never match, whatever the operator
+        with np.errstate(invalid='ignore'):
+            mask &= ~np.isnan(values) & SCREEN_OPERATORS[op](values, value)
+    for text, wanted in screen.sectors:
+        matches = snapshot.sector_mask(text)
+        mask &= matches if wanted else ~matches
+    rows = np.flatnonzero(mask)
+    keys = snapshot.column(screen.sort_by)[rows]
+    # argsort puts NaN last; negating keeps it last for descending order too
+    return rows[np.argsort(-keys if screen.descending else keys, kind='stable')]
+
+
+class ScreenPagination(discord.ui.View):
+    """Pagination view for /screen results"""
+    def __init__(self, snapshot: MarketSnapshot, screen: Screen, rows: np.ndarray):
+        super().__init__(timeout=300)
+        self.snapshot = snapshot
+        self.screen = screen
+        self.rows = rows
+        self.current_page = 0
+        self.max_page = max(0, (len(rows) - 1) // SCREEN_PAGE_SIZE)
+        if self.max_page == 0:
+            self.previous_button.disabled = True
+            self.next_button.disabled = True
+
+    def get_current_embed(self):
+        snapshot = self.snapshot
+        start = self.current_page * SCREEN_PAGE_SIZE
+        embed = discord.Embed(
+            title=f"🔎 MARKET SCREEN • {len(self.rows)} {'match' if len(self.rows) == 1 else 'matches'}",
+            description=f"`{self.screen.describe()}`\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━",
+            color=discord.Color.blue()
+        )
+        for rank, row in enumerate(self.rows[start:start + SCREEN_PAGE_SIZE], start + 1):
+            # Missing cells are None (rendered as N/A), never NaN
+            pct = snapshot.value('pct_change', row)
+            trend = "➡️" if not pct else "📈" if pct > 0 else "📉"
+            code = snapshot.sector_codes[row]
+            sector = snapshot.sectors[code] if code >= 0 else "N/A"
+            turnover = snapshot.value('turnover', row)
+            embed.add_field(
+                name=f"#{rank} {snapshot.symbols[row]} • {sector}",
+                value=(
+                    f"**Price:** Rs. {_format_price(snapshot.value('ltp', row))} | **Change:** {_format_pct(pct)} {trend}\n"
+                    f"**Range:** {_format_price(snapshot.value('low', row))} → {_format_price(snapshot.value('high', row))}\n"
+                    f"**Volume:** {format_number(snapshot.value('volume', row))}"
+                    + (f" | **Turnover:** {format_number(turnover)}" if turnover is not None else "")
+                ),
+                inline=False
+            )
+        if not len(self.rows):
+            embed.add_field(name="No matches", value="Try loosening the filters.", inline=False)
+        embed.set_footer(text=f"As of: {snapshot.as_of} • Page {self.current_page + 1}/{self.max_page + 1} • Data from {snapshot.source}")
+        return embed
+
+    @discord.ui.button(label="◀️ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Go to previous page"""
+        self.current_page = (self.current_page - 1) % (self.max_page + 1)
+        await interaction.response.edit_message(embed=self.get_current_embed(), view=self)
+
+    @discord.ui.button(label="Next ▶️", style=discord.ButtonStyle.secondary)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Go to next page"""
+        self.current_page = (self.current_page + 1) % (self.max_page + 1)
+        await interaction.response.edit_message(embed=self.get_current_embed(), view=self)
+
+
+@client.hybrid_command(name='screen', description='Filter the whole market, e.g. change>5 volume>100k sector=Hydropower')
+@app_commands.describe(expression='Filters and sort, e.g. change>5 volume>100k sector=Hydropower sort=turnover')
+async def screen(ctx, *, expression: str = ""):
+    """
+    Screen every listed stock with filters evaluated over the cached market snapshot
+    Usage: !screen change>5 volume>100k sector=Hydropower sort=volume
+    """
+    await defer_command(ctx)
+    try:
+        parsed = parse_screen(expression)
+    except ScreenError as e:
+        embed = discord.Embed(
+            title="❌ Invalid Screen",
+            description=(
+                f"{e}\n\n**Example:** `/screen change>5 volume>100k sector=Hydropower sort=turnover`\n"
+                "**Operators:** `> >= < <= = !=` • **Units:** `k`, `l` (lakh), `m`, `cr`, `b`"
+            ),
+            color=discord.Color.red()
+        )
+        await ctx.reply(embed=embed)
+        return
+
+    # The snapshot is usually current already; only a stale one touches the network
+    snapshot = await run_blocking(market_snapshot.get, executor=io_executor)
+    with trace_span('screen'):
+        rows = run_screen(snapshot, parsed)
+    view = ScreenPagination(snapshot, parsed, rows)
+    await ctx.reply(embed=view.get_current_embed(), view=view)
+
+
+def get_public_offerings():
+    """All public offerings from ShareHub Nepal, or None if the API reports failure"""
+    # Try to get from cache first
+    cached_data = market_cache.get('all', 'public_offerings')
+    if cached_data is not None:
+        return cached_data
+
+    response = upstream_get(
+        "https://sharehubnepal.com/data/api/v1/public-offering",
+        timeout=10
+    )
+    response.raise_for_status()
+    data = response.json()
+    if not data.get('success'):
+        return None
+
+    all_ipos = data.get('data', {}).get('content', [])
+    market_cache.set('all', 'public_offerings', all_ipos)
+    return all_ipos
+
+
+def build_ipo_embed(open_ipos):
+    """Build the open IPOs grid embed"""
+    # Create embed with vibrant color based on number of IPOs
+    embed_colors = [0x00D9FF, 0xFF006E, 0x8338EC, 0x3A86FF, 0xFB5607, 0x06FFA5]
+    embed_color = embed_colors[len(open_ipos) % len(embed_colors)]
+
+    # Create main embed
+    embed = discord.Embed(
+        title=f"🎯 {len(open_ipos)} Open {'IPO' if len(open_ipos) == 1 else 'IPOs'} Available",
+        description="",
+        color=embed_color
+    )
+
+    # Process each IPO in grid layout
+    for index, ipo in enumerate(open_ipos, 1):
+        # Extract IPO details
+        symbol = ipo.get('symbol', 'N/A')
+        name = ipo.get('name', 'N/A')
+        sector = ipo.get('sector', 'N/A')
+        units = ipo.get('units', 0)
+        price = ipo.get('price', 0)
+        total_amount = ipo.get('totalAmount', 0)
+        opening_date = ipo.get('openingDate', 'N/A')
+        closing_date = ipo.get('closingDate', 'N/A')
+        extended_closing = ipo.get('extendedClosingDate', None)
+        issue_manager = ipo.get('issueManager', 'N/A')
+        ipo_type = ipo.get('type', 'N/A')
+        ipo_for = ipo.get('for', 'N/A')
+
+        # Format dates
+        try:
+            opening_date_obj = datetime.fromisoformat(opening_date.replace('T', ' '))
+            opening_date_str = opening_date_obj.strftime('%d %b %Y')
+        except:
+            opening_date_str = opening_date
+
+        try:
+            closing_date_obj = datetime.fromisoformat(closing_date.replace('T', ' '))
+            closing_date_str = closing_date_obj.strftime('%d %b %Y')
+        except:
+            closing_date_str = closing_date
+
+        # Calculate days remaining with urgency indicator
+        days_left = None
+        urgency_emoji = "🟢"
+        urgency_text = ""
+        try:
+            target_date = extended_closing if extended_closing else closing_date
+            target_date_obj = datetime.fromisoformat(target_date.replace('T', ' '))
+            days_left = (target_date_obj - datetime.now()).days
+
+            if days_left >= 0:
+                if days_left <= 2:
+                    urgency_emoji = "🔴"
+                    urgency_text = f"LAST {days_left} DAY{'S' if days_left != 1 else ''}!"
+                elif days_left <= 5:
+                    urgency_emoji = "🟡"
+                    urgency_text = f"{days_left} days left"
+                else:
+                    urgency_emoji = "🟢"
+                    urgency_text = f"{days_left} days"
+        except:
+            urgency_text = "Check dates"
+
+        # Type emoji
+        type_emojis = {
+            'Ipo': '🆕',
+            'Right': '🔄',
+            'MutualFund': '💼',
+            'BondOrDebenture': '💰'
+        }
+        type_emoji = type_emojis.get(ipo_type, '📊')
+
+        # Rank emoji
+        rank_emojis = {1: "🥇", 2: "🥈", 3: "🥉"}
+        rank_emoji = rank_emojis.get(index, "💎")
+
+        # Build left column (Company & Financial Info)
+        left_column = (
+            f"**{type_emoji} Type:** {ipo_type}\n\n"
+            f"**🏢 Sector:** {sector}\n\n"
+            f"**👥 For:** {ipo_for}\n\n"
+            f"**📊 Units:** {units:,}\n\n"
+            f"**💵 Price:** Rs. {price:,}\n\n"
+            f"**💰 Amount:** {format_rupees(total_amount)}"
+        )
+
+        # Build right column (Timeline & Manager)
+        right_column = (
+            f"**📅 Opens:** {opening_date_str}\n\n"
+            f"**📅 Closes:** {closing_date_str}\n\n"
+        )
+
+        if extended_closing:
+            try:
+                ext_date_obj = datetime.fromisoformat(extended_closing.replace('T', ' '))
+                right_column += f"**🔄 Extended:** {ext_date_obj.strftime('%d %b %Y')}\n\n"
+            except:
+                pass
+
+        right_column += f"**{urgency_emoji} Status:** {urgency_text}\n\n"
+        right_column += f"**🏦 Manager:** {issue_manager}"
+
+        # Add company name as field title with spacing
+        embed.add_field(
+            name=f"\u200b",
+            value=f"## {rank_emoji} **{symbol}** — {name}",
+            inline=False
+        )
+
+        # Add two columns side by side
+        embed.add_field(
+            name="📋 Details",
+            value=left_column,
+            inline=True
+        )
+
+        embed.add_field(
+            name="⏰ Timeline",
+            value=right_column,
+            inline=True
+        )
+
+        # Add spacer between IPOs if there are multiple
+        if index < len(open_ipos):
+            embed.add_field(
+                name="\u200b",
+                value="\u200b",
+                inline=False
+            )
+            embed.add_field(
+                name="\u200b",
+                value="\u200b",
+                inline=False
+            )
+    return embed
+
+
 @client.hybrid_command(name='ipo', description='View all open IPOs/public offerings')
 async def ipo(ctx):
     """
     Display all IPOs with "Open" status in a clean grid layout
     """
-    await ctx.defer()
+    await defer_command(ctx)
     
     try:
         # Fetch data from ShareHub Nepal API
-        response = requests.get(
-            "https://sharehubnepal.com/data/api/v1/public-offering",
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
+        all_ipos = await run_blocking(get_public_offerings, executor=io_executor)
         
-        if not data.get('success'):
+        if all_ipos is None:
             embed = discord.Embed(
                 title="⚠️ Unable to Fetch IPO Data",
                 description="API request failed. Please try again later.",
@@ -2099,7 +5187,6 @@ async def ipo(ctx):
             return
         
         # Filter for open IPOs
-        all_ipos = data.get('data', {}).get('content', [])
         open_ipos = [ipo for ipo in all_ipos if ipo.get('status') == 'Open']
         
         if not open_ipos:
@@ -2111,145 +5198,17 @@ async def ipo(ctx):
             await ctx.reply(embed=embed)
             return
         
-        # Create embed with vibrant color based on number of IPOs
-        embed_colors = [0x00D9FF, 0xFF006E, 0x8338EC, 0x3A86FF, 0xFB5607, 0x06FFA5]
-        embed_color = embed_colors[len(open_ipos) % len(embed_colors)]
-        
-        # Create main embed
-        embed = discord.Embed(
-            title=f"🎯 {len(open_ipos)} Open {'IPO' if len(open_ipos) == 1 else 'IPOs'} Available",
-            description="",
-            color=embed_color
-        )
-        
-        # Process each IPO in grid layout
-        for index, ipo in enumerate(open_ipos, 1):
-            # Extract IPO details
-            symbol = ipo.get('symbol', 'N/A')
-            name = ipo.get('name', 'N/A')
-            sector = ipo.get('sector', 'N/A')
-            units = ipo.get('units', 0)
-            price = ipo.get('price', 0)
-            total_amount = ipo.get('totalAmount', 0)
-            opening_date = ipo.get('openingDate', 'N/A')
-            closing_date = ipo.get('closingDate', 'N/A')
-            extended_closing = ipo.get('extendedClosingDate', None)
-            issue_manager = ipo.get('issueManager', 'N/A')
-            ipo_type = ipo.get('type', 'N/A')
-            ipo_for = ipo.get('for', 'N/A')
-            
-            # Format dates
-            try:
-                opening_date_obj = datetime.fromisoformat(opening_date.replace('T', ' '))
-                opening_date_str = opening_date_obj.strftime('%d %b %Y')
-            except:
-                opening_date_str = opening_date
-            
-            try:
-                closing_date_obj = datetime.fromisoformat(closing_date.replace('T', ' '))
-                closing_date_str = closing_date_obj.strftime('%d %b %Y')
-            except:
-                closing_date_str = closing_date
-            
-            # Calculate days remaining with urgency indicator
-            days_left = None
-            urgency_emoji = "🟢"
-            urgency_text = ""
-            try:
-                target_date = extended_closing if extended_closing else closing_date
-                target_date_obj = datetime.fromisoformat(target_date.replace('T', ' '))
-                days_left = (target_date_obj - datetime.now()).days
-                
-                if days_left >= 0:
-                    if days_left <= 2:
-                        urgency_emoji = "🔴"
-                        urgency_text = f"LAST {days_left} DAY{'S' if days_left != 1 else ''}!"
-                    elif days_left <= 5:
-                        urgency_emoji = "🟡"
-                        urgency_text = f"{days_left} days left"
-                    else:
-                        urgency_emoji = "🟢"
-                        urgency_text = f"{days_left} days"
-            except:
-                urgency_text = "Check dates"
-            
-            # Type emoji
-            type_emojis = {
-                'Ipo': '🆕',
-                'Right': '🔄',
-                'MutualFund': '💼',
-                'BondOrDebenture': '💰'
-            }
-            type_emoji = type_emojis.get(ipo_type, '📊')
-            
-            # Rank emoji
-            rank_emojis = {1: "🥇", 2: "🥈", 3: "🥉"}
-            rank_emoji = rank_emojis.get(index, "💎")
-            
-            # Build left column (Company & Financial Info)
-            left_column = (
-                f"**{type_emoji} Type:** {ipo_type}\n\n"
-                f"**🏢 Sector:** {sector}\n\n"
-                f"**👥 For:** {ipo_for}\n\n"
-                f"**📊 Units:** {units:,}\n\n"
-                f"**💵 Price:** Rs. {price:,}\n\n"
-                f"**💰 Amount:** {format_rupees(total_amount)}"
-            )
-            
-            # Build right column (Timeline & Manager)
-            right_column = (
-                f"**📅 Opens:** {opening_date_str}\n\n"
-                f"**📅 Closes:** {closing_date_str}\n\n"
-            )
-            
-            if extended_closing:
-                try:
-                    ext_date_obj = datetime.fromisoformat(extended_closing.replace('T', ' '))
-                    right_column += f"**🔄 Extended:** {ext_date_obj.strftime('%d %b %Y')}\n\n"
-                except:
-                    pass
-            
-            right_column += f"**{urgency_emoji} Status:** {urgency_text}\n\n"
-            right_column += f"**🏦 Manager:** {issue_manager}"
-            
-            # Add company name as field title with spacing
-            embed.add_field(
-                name=f"\u200b",
-                value=f"## {rank_emoji} **{symbol}** — {name}",
-                inline=False
-            )
-            
-            # Add two columns side by side
-            embed.add_field(
-                name="📋 Details",
-                value=left_column,
-                inline=True
-            )
-            
-            embed.add_field(
-                name="⏰ Timeline",
-                value=right_column,
-                inline=True
-            )
-            
-            # Add spacer between IPOs if there are multiple
-            if index < len(open_ipos):
-                embed.add_field(
-                    name="\u200b",
-                    value="\u200b",
-                    inline=False
-                )
-                embed.add_field(
-                    name="\u200b",
-                    value="\u200b",
-                    inline=False
-                )
+        # Reuse the rendered embed until the IPO listing snapshot changes
+        version = market_cache.get_version('all', 'public_offerings')
+        embed = embed_cache.get_or_build('ipo', version, lambda: build_ipo_embed(open_ipos))
         
         # Create button view for MeroShare application
         view = IPOApplyButton()
         
         await ctx.reply(embed=embed, view=view)
         
+    except ExecutorSaturated:
+        raise  # Answered by the global command error handler
     except requests.exceptions.RequestException as e:
         embed = discord.Embed(
             title="🔌 Connection Error",
@@ -2266,10 +5225,238 @@ async def ipo(ctx):
         await ctx.reply(embed=embed)
 
 
+# ============================================
+# Live Ticker Boards (one pinned message per channel, edited in place)
+# ============================================
+
+TICKERBOARD_INTERVAL = max(15, int(os.getenv("NTB_TICKERBOARD_INTERVAL", "60")))  # Seconds between refreshes
+TICKERBOARD_MAX_SYMBOLS = 10
+
+# channel_id -> {'guild_id', 'message_id', 'symbols'}; never expires
+ticker_boards = PersistentStore('ticker_boards.json', float('inf'))
+
+
+def fetch_ticker_board_data():
+    """One shared fetch for every board: live board, indices and top movers"""
+    snapshot = market_snapshot.get()
+    try:
+        indices = get_nepse_indices()
+    except requests.exceptions.RequestException:
+        indices = []
+    try:
+        gainers, losers, _, _, _ = get_top_movers('change', 3)
+    except requests.exceptions.RequestException:
+        gainers, losers = [], []
+    return {
+        'as_of': snapshot.as_of,
+        'snapshot': snapshot,
+        'indices': indices,
+        'gainers': gainers,
+        'losers': losers,
+    }
+
+
+def build_ticker_board_embed(symbols, data):
+    """Build a ticker board embed for a watchlist from the shared data snapshot"""
+    embed = discord.Embed(
+        title="📟 NEPSE Live Ticker Board",
+        description="━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━",
+        color=discord.Color.blue(),
+        timestamp=datetime.now(timezone.utc)
+    )
+
+    watch_lines = []
+    for symbol in symbols:
+        quote = data['snapshot'].quote(symbol)
+        if quote is None:
+            watch_lines.append(f"⚪ **{symbol}** N/A")
+            continue
+        pct = quote.pct_change or 0.0
+        indicator = "🟢" if pct > 0 else "🔴" if pct < 0 else "⚪"
+        watch_lines.append(f"{indicator} **{symbol}** Rs. {_format_price(quote.ltp)} ({pct:+.2f}%)")
+    embed.add_field(
+        name="👀 WATCHLIST",
+        value="\n".join(watch_lines) or "No symbols. Use `/tickerboard start NABIL NICA`",
+        inline=False
+    )
+
+    index_lines = []
+    for row in data['indices'][:4]:
+        pct = row.pct_change or 0.0
+        indicator = "🟢" if pct > 0 else "🔴" if pct < 0 else "⚪"
+        index_lines.append(f"{indicator} **{row.name}** {_format_price(row.close)} ({_format_pct(row.pct_change)})")
+    if index_lines:
+        embed.add_field(name="📊 INDICES", value="\n".join(index_lines), inline=False)
+
+    if data['gainers']:
+        embed.add_field(
+            name="📈 TOP GAINERS",
+            value="\n".join(f"**{s.symbol}** {_format_pct(s.pct_change)}" for s in data['gainers'][:3]),
+            inline=True
+        )
+    if data['losers']:
+        embed.add_field(
+            name="📉 TOP LOSERS",
+            value="\n".join(f"**{s.symbol}** {_format_pct(s.pct_change)}" for s in data['losers'][:3]),
+            inline=True
+        )
+
+    embed.set_footer(text=f"As of: {data['as_of']} • Refreshes every {TICKERBOARD_INTERVAL}s")
+    return embed
+
+
+@tasks.loop(seconds=TICKERBOARD_INTERVAL)
+async def refresh_ticker_boards():
+    """
+    Single poller: fetch once, then edit every board message in place.
+    Edit rate limits are per channel and each channel has one board edited once per interval,
+    so edits aren't spaced out; discord.py waits out any 429 it does hit.
+    """
+    if not leader_lease.is_leader:
+        return
+    # Boards may have been started or stopped through another process
+    ticker_boards.load()
+    if not len(ticker_boards):
+        return
+    try:
+        data = await client.loop.run_in_executor(None, fetch_ticker_board_data)
+    except Exception as e:
+        print(f"Ticker board refresh failed: {e}")
+        return
+
+    # Boards with the same watchlist share one rendered embed
+    rendered = {}
+    removed = []
+    for channel_key, entry in list(ticker_boards.entries.items()):
+        board = entry['data']
+        symbols = tuple(board['symbols'])
+        if symbols not in rendered:
+            rendered[symbols] = build_ticker_board_embed(symbols, data)
+
+        channel = client.get_channel(int(channel_key))
+        try:
+            if channel is None:
+                channel = await client.fetch_channel(int(channel_key))
+            await channel.get_partial_message(board['message_id']).edit(embed=rendered[symbols])
+        except (discord.NotFound, discord.Forbidden):
+            # Message or channel is gone, or we lost access - stop updating this board
+            removed.append((channel_key, board['message_id']))
+        except discord.HTTPException as e:
+            print(f"Ticker board edit failed in channel {channel_key}: {e}")
+
+    if removed:
+        await client.loop.run_in_executor(None, remove_ticker_boards, removed)
+
+
+def remove_ticker_boards(removed: List[Tuple[str, int]]) -> None:
+    """Drop dead boards, re-reading the file first so boards changed meanwhile by another process survive"""
+    with ticker_boards.transaction():
+        for channel_key, message_id in removed:
+            board = ticker_boards.get(channel_key)
+            # Skip boards that were restarted with a new message while we were editing
+            if board is not None and board['message_id'] == message_id:
+                ticker_boards.delete(channel_key)
+                print(f"Ticker board in channel {channel_key} removed (message unavailable)")
+
+
+@client.hybrid_command(name='tickerboard', description='Pin a live ticker board in this channel (Manage Channels)')
+@app_commands.describe(
+    action='start, stop or status',
+    symbols='Watchlist symbols separated by spaces (e.g., NABIL NICA UPPER)'
+)
+async def tickerboard(ctx, action: str = 'start', *, symbols: str = ''):
+    """Start, stop or show the live ticker board for this channel"""
+    await defer_command(ctx, ephemeral=True)
+    
+    # Check if command is used in a guild (not DM)
+    if ctx.guild is None:
+        await ctx.reply('❌ This command can only be used in a server, not in DMs.')
+        return
+    
+    if not ctx.author.guild_permissions.manage_channels:
+        await ctx.reply("❌ You need the **Manage Channels** permission to manage ticker boards.")
+        return
+    
+    action = action.lower()
+    channel_key = str(ctx.channel.id)
+    
+    if action == 'stop':
+        with ticker_boards.transaction():
+            board = ticker_boards.get(channel_key)
+            ticker_boards.delete(channel_key)
+        if board is None:
+            await ctx.reply("ℹ️ There is no ticker board in this channel.")
+            return
+        try:
+            await ctx.channel.get_partial_message(board['message_id']).unpin()
+        except discord.HTTPException:
+            pass
+        await ctx.reply("🛑 Ticker board stopped for this channel.")
+        return
+    
+    if action == 'status':
+        ticker_boards.load()
+        boards = [
+            (int(key), entry['data']) for key, entry in ticker_boards.entries.items()
+            if entry['data']['guild_id'] == ctx.guild.id
+        ]
+        if not boards:
+            await ctx.reply("ℹ️ No ticker boards are running in this server.")
+            return
+        lines = [f"<#{channel_id}>: {', '.join(board['symbols']) or 'indices only'}" for channel_id, board in boards]
+        await ctx.reply("📟 **Ticker boards**\n" + "\n".join(lines) + f"\n\nRefreshing every {TICKERBOARD_INTERVAL}s")
+        return
+    
+    if action != 'start':
+        await ctx.reply("❌ Unknown action. Use `start`, `stop` or `status`.")
+        return
+    
+    # Validate the watchlist locally
+    watchlist, unknown = [], []
+    for raw_symbol in symbols.replace(',', ' ').split():
+        symbol, _ = resolve_symbol(raw_symbol)
+        if symbol is None:
+            unknown.append(raw_symbol.upper())
+        elif symbol not in watchlist:
+            watchlist.append(symbol)
+    watchlist = watchlist[:TICKERBOARD_MAX_SYMBOLS]
+    
+    ticker_boards.load()
+    board = ticker_boards.get(channel_key)
+    if board is not None:
+        message_id = board['message_id']
+    else:
+        placeholder = discord.Embed(
+            title="📟 NEPSE Live Ticker Board",
+            description="⏳ Loading market data...",
+            color=discord.Color.blue()
+        )
+        message = await ctx.channel.send(embed=placeholder)
+        message_id = message.id
+        try:
+            await message.pin()
+        except discord.HTTPException:
+            pass
+    
+    with ticker_boards.transaction():
+        ticker_boards.set(channel_key, {
+            'guild_id': ctx.guild.id,
+            'message_id': message_id,
+            'symbols': watchlist,
+        })
+    if not refresh_ticker_boards.is_running():
+        refresh_ticker_boards.start()
+    
+    reply = f"✅ Ticker board {'updated' if board else 'started'} with {len(watchlist)} symbol(s). It refreshes every {TICKERBOARD_INTERVAL}s."
+    if unknown:
+        reply += f"\n⚠️ Ignored unknown symbols: {', '.join(unknown)}"
+    await ctx.reply(reply)
+
+
 @client.hybrid_command(name='cachestats', description='View cache statistics (Admin only)')
 async def cachestats(ctx):
     """Display cache statistics"""
-    await ctx.defer()
+    await defer_command(ctx)
     
     # Check if command is used in a guild (not DM)
     if ctx.guild is None:
@@ -2285,7 +5472,7 @@ async def cachestats(ctx):
     
     embed = discord.Embed(
         title="📊 Cache Statistics",
-        description="Current in-memory cache status",
+        description=f"Current cache status ({'shared SQLite' if CACHE_BACKEND == 'sqlite' else 'in-memory'})",
         color=discord.Color.blue()
     )
     
@@ -2294,10 +5481,50 @@ async def cachestats(ctx):
     embed.add_field(name="Market Summary", value=stats['market_summary'], inline=True)
     embed.add_field(name="Sub Indices", value=stats['sub_indices'], inline=True)
     embed.add_field(name="Top G/L", value=stats['top_gainers_losers'], inline=True)
-    embed.add_field(name="Company Logos", value=stats['company_logo'], inline=True)
+    embed.add_field(name="Company Logos", value=len(company_logos), inline=True)
+    embed.add_field(name="Company Metadata", value=len(company_metadata), inline=True)
+    
+    http_stats = http_cache.get_stats()
+    embed.add_field(
+        name="HTTP Cache (disk)",
+        value=(
+            f"Entries: {http_stats['entries']} | Fresh hits: {http_stats['fresh_hits']}\n"
+            f"Revalidated (304): {http_stats['revalidated']} | Stale served: {http_stats['stale_served']} | Evicted: {http_stats['evicted']}"
+        ),
+        inline=False
+    )
     embed.add_field(name="NEPSE Indices", value=stats['nepse_indices'], inline=True)
+    embed.add_field(name="Negative Entries", value=stats['negative'], inline=True)
+    embed.add_field(
+        name="Rendered Embeds",
+        value=f"{len(embed_cache.entries)} cached | {embed_cache.hits} hits / {embed_cache.misses} builds",
+        inline=True
+    )
+    
+    embed.add_field(
+        name="Background Pollers",
+        value=f"{'Leader' if leader_lease.is_leader else 'Follower'} ({INSTANCE_ID})",
+        inline=True
+    )
+    
+    snapshot_stats = market_snapshot.get_stats()
+    embed.add_field(
+        name="Market Snapshot",
+        value=(
+            f"{snapshot_stats['rows']} rows from {snapshot_stats['source']} | {snapshot_stats['builds']} builds, last {snapshot_stats['build_ms']:.1f}ms"
+            if snapshot_stats['rows'] else "Not built yet"
+        ),
+        inline=True
+    )
+    
+    if 'cache_warmup' in startup_timings:
+        embed.add_field(
+            name="Startup Warm-up",
+            value=f"{startup_timings['cache_warmup']:.1f}s ({_restored_entries} entries restored from snapshot)",
+            inline=True
+        )
     
-    embed.set_footer(text="Cache TTL: Stock(20s), Summary(60s), Logos(1h)")
+    embed.set_footer(text="Cache TTL: Stock(20s), Summary(60s), Logos/Metadata(7d, on disk)")
     
     await ctx.reply(embed=embed)
 
@@ -2305,7 +5532,7 @@ async def cachestats(ctx):
 @client.hybrid_command(name='clearcache', description='Clear cache (Admin only)')
 async def clearcache(ctx, category: str = None):
     """Clear cache for optimization"""
-    await ctx.defer()
+    await defer_command(ctx)
     
     # Check if command is used in a guild (not DM)
     if ctx.guild is None:
@@ -2323,4 +5550,233 @@ async def clearcache(ctx, category: str = None):
         await ctx.reply(f"✅ Cache cleared for category: `{category}`")
     else:
         await ctx.reply("✅ All cache cleared successfully!")
-client.run(MY_BOT_TOKEN)
+
+
+@client.hybrid_command(name='upstreams', description='View upstream rate limit and circuit breaker state (Admin only)')
+async def upstreams(ctx):
+    """Display per-host rate limiter and circuit breaker statistics"""
+    await defer_command(ctx)
+    
+    # Check if command is used in a guild (not DM)
+    if ctx.guild is None:
+        await ctx.reply('❌ This command can only be used in a server, not in DMs.')
+        return
+    
+    # Check if user has admin permissions
+    if not ctx.author.guild_permissions.administrator:
+        await ctx.reply("❌ This command is only available to administrators.")
+        return
+    
+    embed = discord.Embed(
+        title="🌐 Upstream Status",
+        description="Per-host rate limiting and circuit breakers",
+        color=discord.Color.blue()
+    )
+    
+    state_emojis = {'closed': '🟢', 'half-open': '🟡', 'open': '🔴'}
+    for host, guard in sorted(host_guards.items()):
+        stats = guard.get_stats()
+        embed.add_field(
+            name=f"{state_emojis.get(stats['state'], '⚪')} {host}",
+            value=(
+                f"**Breaker:** {stats['state']}\n"
+                f"**Requests:** {stats['requests']} | **Failures:** {stats['failures']}\n"
+                f"**Rejected:** {stats['rejected_rate_limit']} (rate) / {stats['rejected_breaker']} (breaker)"
+            ),
+            inline=False
+        )
+    
+    if not host_guards:
+        embed.add_field(name="No upstream requests yet", value="\u200b", inline=False)
+    
+    embed.set_footer(text=f"Breaker opens after {BREAKER_FAILURE_THRESHOLD} consecutive failures, retries after {BREAKER_RESET_TIMEOUT}s")
+    
+    await ctx.reply(embed=embed)
+
+
+@client.hybrid_command(name='loadstats', description='View admission control queue and rejections (Admin only)')
+async def loadstats(ctx):
+    """Display admission control statistics"""
+    await defer_command(ctx)
+    
+    # Check if command is used in a guild (not DM)
+    if ctx.guild is None:
+        await ctx.reply('❌ This command can only be used in a server, not in DMs.')
+        return
+    
+    # Check if user has admin permissions
+    if not ctx.author.guild_permissions.administrator:
+        await ctx.reply("❌ This command is only available to administrators.")
+        return
+    
+    stats = admission.get_stats()
+    
+    embed = discord.Embed(
+        title="🚦 Command Load",
+        description="Admission control for commands",
+        color=discord.Color.blue()
+    )
+    
+    embed.add_field(name="Running", value=f"{stats['active']}/{ADMISSION_MAX_CONCURRENT}", inline=True)
+    embed.add_field(name="Queued", value=f"{stats['queue_depth']}/{ADMISSION_MAX_QUEUE}", inline=True)
+    embed.add_field(name="Admitted", value=stats['admitted'], inline=True)
+    embed.add_field(
+        name="Running by Class",
+        value="\n".join(f"**{cls}:** {count}/{CLASS_CONCURRENCY[cls]}" for cls, count in sorted(stats['active_by_class'].items())) or "None",
+        inline=True
+    )
+    embed.add_field(
+        name="Rejections",
+        value="\n".join(f"**{reason}:** {count}" for reason, count in sorted(stats['rejections'].items())) or "None",
+        inline=True
+    )
+    
+    embed.add_field(
+        name="Executors",
+        value="\n".join(
+            f"**{name}:** {stats['active']}/{stats['max_workers']} busy, {stats['queued']} queued, {stats['rejected']} shed"
+            for name, stats in ((name, executor.get_stats()) for name, executor in bounded_executors.items())
+        ),
+        inline=False
+    )
+    
+    embed.set_footer(text=f"Per user: {ADMISSION_USER_CONCURRENCY} concurrent, {ADMISSION_USER_RATE[0]}/{ADMISSION_USER_RATE[1]}s • Per server: {ADMISSION_GUILD_CONCURRENCY} concurrent, {ADMISSION_GUILD_RATE[0]}/{ADMISSION_GUILD_RATE[1]}s")
+    
+    await ctx.reply(embed=embed)
+
+
+@client.hybrid_command(name='alertstats', description='View alert DM delivery queue and latency (Admin only)')
+async def alertstats(ctx):
+    """Display alert delivery statistics"""
+    await defer_command(ctx)
+    
+    # Check if command is used in a guild (not DM)
+    if ctx.guild is None:
+        await ctx.reply('❌ This command can only be used in a server, not in DMs.')
+        return
+    
+    # Check if user has admin permissions
+    if not ctx.author.guild_permissions.administrator:
+        await ctx.reply("❌ This command is only available to administrators.")
+        return
+    
+    stats = alert_dispatcher.get_stats()
+    
+    def fmt_latency(value):
+        return f"{value:.2f}s" if value is not None else "N/A"
+    
+    embed = discord.Embed(
+        title="🔔 Alert Delivery",
+        description="DM queue for price alerts",
+        color=discord.Color.blue()
+    )
+    
+    embed.add_field(name="Queued Users", value=stats['queue_depth'], inline=True)
+    embed.add_field(name="Delivered", value=f"{stats['delivered']} alerts in {stats['messages']} DMs", inline=True)
+    embed.add_field(name="Failed", value=stats['failed'], inline=True)
+    embed.add_field(name="Coalesced", value=stats['coalesced'], inline=True)
+    embed.add_field(name="Retries", value=f"{stats['retries']} ({stats['rate_limited']} rate limited)", inline=True)
+    embed.add_field(name="Latency", value=f"p50 {fmt_latency(stats['p50'])} • p95 {fmt_latency(stats['p95'])}", inline=True)
+    
+    footer = f"Concurrency: {ALERT_DELIVERY_CONCURRENCY} • Cached DM channels: {stats['dm_channels']}"
+    if stats['paused_for']:
+        footer += f" • Backing off {stats['paused_for']:.1f}s"
+    embed.set_footer(text=footer)
+    
+    await ctx.reply(embed=embed)
+
+
+@client.hybrid_command(name='perfstats', description='Command latency percentiles and slowest traces (Admin only)')
+@app_commands.describe(
+    action='show, profile (profile the next run of a command) or lastprofile',
+    command='Command to profile (e.g., stonk)'
+)
+async def perfstats(ctx, action: str = 'show', command: str = None):
+    """Display per-command latency percentiles and the slowest recent traces"""
+    await defer_command(ctx)
+    
+    # Check if command is used in a guild (not DM)
+    if ctx.guild is None:
+        await ctx.reply('❌ This command can only be used in a server, not in DMs.')
+        return
+    
+    # Check if user has admin permissions
+    if not ctx.author.guild_permissions.administrator:
+        await ctx.reply("❌ This command is only available to administrators.")
+        return
+    
+    action = action.lower()
+    if action == 'profile':
+        target = client.get_command(command or '')
+        if target is None:
+            await ctx.reply("❌ Give the name of a command to profile, e.g. `/perfstats profile stonk`.")
+            return
+        tracer.profile_target = target.qualified_name
+        await ctx.reply(f"🔬 The next `{target.qualified_name}` run will be profiled. Use `/perfstats lastprofile` to see it.")
+        return
+    
+    if action == 'lastprofile':
+        if tracer.last_profile is None:
+            await ctx.reply("ℹ️ No profile has been captured yet.")
+            return
+        name, report = tracer.last_profile
+        await ctx.reply(
+            f"🔬 cProfile of `{name}` (event-loop thread, sorted by cumulative time)",
+            file=discord.File(io.BytesIO(report.encode('utf-8')), filename=f"{name}_profile.txt")
+        )
+        return
+    
+    percentiles = tracer.percentiles()
+    embed = discord.Embed(
+        title="⏱️ Command Performance",
+        description=f"Last {TRACE_LATENCY_WINDOW} runs per command",
+        color=discord.Color.blue()
+    )
+    
+    if not percentiles:
+        embed.add_field(name="Commands", value="No commands traced yet", inline=False)
+    ranked = sorted(percentiles.items(), key=lambda item: item[1][2], reverse=True)[:15]
+    for name, (samples, p50, p95, p99) in ranked:
+        embed.add_field(
+            name=f"/{name}",
+            value=f"p50 {p50 * 1000:.0f}ms\np95 {p95 * 1000:.0f}ms\np99 {p99 * 1000:.0f}ms\n{samples} runs",
+            inline=True
+        )
+    
+    for when, root in tracer.slowest(3):
+        tree = "\n".join(TraceRecorder.format_span(root))
+        if len(tree) > 1000:
+            tree = tree[:1000].rsplit("\n", 1)[0] + "\n…"
+        embed.add_field(
+            name=f"🐢 {root.name} • {root.duration * 1000:.0f}ms • {when.strftime('%H:%M:%S')}",
+            value=f"```\n{tree}\n```",
+            inline=False
+        )
+    
+    recent_blocks = list(loop_watchdog.blocks)[-5:]
+    if recent_blocks:
+        embed.add_field(
+            name=f"🧊 Event Loop Stalls (>{LOOP_BLOCK_THRESHOLD}s)",
+            value="\n".join(
+                f"`{block['when'].strftime('%H:%M:%S')}` {block['duration']:.2f}s • {block['source']} • `{block['location']}`"
+                for block in reversed(recent_blocks)
+            ),
+            inline=False
+        )
+    
+    embed.set_footer(text=f"{len(tracer.traces)} traces in buffer • /perfstats profile <command> to capture a cProfile")
+    
+    await ctx.reply(embed=embed)
+
+
+startup_timings['module_init'] = time.perf_counter() - STARTUP_T0 - startup_timings['imports']
+STARTUP_RUN_T0 = time.perf_counter()
+client.setup_hook = setup_bot
+
+if __name__ == "__main__":
+    client.run(MY_BOT_TOKEN)
+
+    # client.run returns after the bot is closed (Ctrl+C or SIGTERM)
+    saved = market_cache.save_snapshot(CACHE_SNAPSHOT_PATH)
+    if saved:
+        print(f"Market cache: saved {saved} entries to snapshot")
@@ -0,0 +1,92 @@
+"""Tests for the /screen expression parser and the vectorized screen over a market snapshot"""
+import os
+import tempfile
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("discord")
+
+os.environ.setdefault("NTB_DATA_DIR", tempfile.mkdtemp())
+os.environ.setdefault("NTB_METRICS_PORT", "0")
+
+import main  # noqa: E402  (needs the environment above)
+
+
+def make_snapshot(rows):
+    """rows: (symbol, sector, ltp, pct_change, volume, turnover)"""
+    for symbol, sector, *_ in rows:
+        main.company_metadata.set(symbol, {"sector": sector, "share registrar": "N/A", "company fullform": symbol})
+    quotes = [
+        main.Quote(symbol, ltp, None, pct, None, None, None, volume, None, "now")
+        for symbol, _, ltp, pct, volume, _ in rows
+    ]
+    return main.MarketSnapshot("now", "test", quotes, turnover=[row[5] for row in rows])
+
+
+@pytest.fixture
+def snapshot():
+    return make_snapshot([
+        ("HYDA", "Hydro Power", 300.0, 6.0, 200_000.0, 60e6),
+        ("HYDB", "Hydro Power", 150.0, 2.0, 50_000.0, None),
+        ("BANKA", "Commercial Banks", 500.0, -3.0, 120_000.0, 55e6),
+        ("NODATA", "Commercial Banks", None, None, None, None),
+    ])
+
+
+def screen(snapshot, expression):
+    rows = main.run_screen(snapshot, main.parse_screen(expression))
+    return [snapshot.symbols[row] for row in rows]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("5", 5.0),
+    ("100k", 100_000.0),
+    ("1.5m", 1_500_000.0),
+    ("2cr", 20_000_000.0),
+    ("3l", 300_000.0),
+    ("1b", 1e9),
+    ("1,200", 1200.0),
+    ("2.5%", 2.5),
+])
+def test_parse_screen_value_units(text, expected):
+    assert main._parse_screen_value(text) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("expression", ["foo>1", "change>abc", "sector>3", "sort=nope", "change"])
+def test_parse_screen_rejects_bad_terms(expression):
+    with pytest.raises(main.ScreenError):
+        main.parse_screen(expression)
+
+
+def test_parse_screen_sort_and_order():
+    parsed = main.parse_screen("vol>=10k sort=turnover asc")
+    assert parsed.filters == [("volume", ">=", 10_000.0)]
+    assert parsed.sort_by == "turnover"
+    assert parsed.descending is False
+
+
+def test_numeric_filters_and_default_sort(snapshot):
+    assert screen(snapshot, "change>1 volume>100k") == ["HYDA"]
+    assert screen(snapshot, "") == ["HYDA", "HYDB", "BANKA", "NODATA"]
+
+
+def test_missing_values_never_match_even_with_not_equal(snapshot):
+    assert "NODATA" not in screen(snapshot, "change!=0")
+    assert "NODATA" not in screen(snapshot, "ltp!=1")
+
+
+def test_sector_filters_ignore_case_and_spaces(snapshot):
+    assert screen(snapshot, "sector=hydropower") == ["HYDA", "HYDB"]
+    assert screen(snapshot, "sector!=hydropower") == ["BANKA", "NODATA"]
+
+
+def test_sort_puts_missing_values_last(snapshot):
+    assert screen(snapshot, "sort=turnover") == ["HYDA", "BANKA", "HYDB", "NODATA"]
+    assert screen(snapshot, "sort=turnover asc")[:2] == ["BANKA", "HYDA"]
+
+
+def test_snapshot_values_are_none_not_nan(snapshot):
+    row = snapshot.index["NODATA"]
+    assert snapshot.value("ltp", row) is None
+    assert main._format_price(snapshot.value("ltp", row)) == "N/A"